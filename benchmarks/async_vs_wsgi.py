@@ -0,0 +1,149 @@
+"""
+Throughput of the product and favorites read endpoints under concurrency:
+
+* ``wsgi``       - sync DRF views behind root.wsgi, a fixed pool of server threads;
+* ``asgi-sync``  - the same sync views behind root.asgi (each one hops to a thread);
+* ``asgi-async`` - the native async views (``.../async/``) behind root.asgi.
+
+Slow clients are simulated by a delay while the response body is delivered:
+a WSGI thread is blocked for that time, an ASGI worker just awaits it.
+
+    python -m benchmarks.async_vs_wsgi --products 10000 --concurrency 64 --client-delay 0.005
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import print_table, seed_catalog, seed_user, setup, summarize
+
+ENDPOINTS = {
+    # имя: (путь синхронного представления, путь асинхронного)
+    'list': ('/products/?page_size=50', '/products/async/?page_size=50'),
+    'detail': ('/products/1/', '/products/1/async/'),
+    'favorites': ('/favorite/', '/favorite/async/'),
+}
+
+
+def split_path(path):
+    path, _, query = path.partition('?')
+    return path, query
+
+
+def run_wsgi(app, path, headers, total, threads, client_delay):
+    from django.test import RequestFactory
+
+    factory = RequestFactory()
+    path, query = split_path(path)
+
+    def handle(submitted):
+        environ = factory.get(path, QUERY_STRING=query, **headers).environ
+        statuses = []
+        body = app(environ, lambda status, response_headers, exc_info=None: statuses.append(status))
+        try:
+            for _ in body:
+                if client_delay:
+                    # Поток сервера занят, пока медленный клиент читает ответ
+                    time.sleep(client_delay)
+        finally:
+            body.close()
+        return time.perf_counter() - submitted, statuses[0]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [pool.submit(handle, time.perf_counter()) for _ in range(total)]
+        results = [future.result() for future in futures]
+    return results, time.perf_counter() - started
+
+
+async def run_asgi(app, path, headers, total, concurrency, client_delay):
+    path, query = split_path(path)
+    raw_headers = [(b'host', b'testserver')]
+    raw_headers += [(name[5:].lower().replace('_', '-').encode(), value.encode())
+                    for name, value in headers.items()]
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': query.encode(), 'root_path': '', 'headers': raw_headers,
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }
+    never = asyncio.Event()
+
+    async def request():
+        sent = False
+        status = []
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await never.wait()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+            elif message['type'] == 'http.response.body' and client_delay:
+                await asyncio.sleep(client_delay)
+
+        started = time.perf_counter()
+        await app(dict(scope), receive, send)
+        return time.perf_counter() - started, status[0]
+
+    results = []
+    remaining = total
+
+    async def client():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            results.append(await request())
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return results, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', help='SQLite file for the seeded catalog')
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--favorites', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=1000, help='Requests per endpoint and mode')
+    parser.add_argument('--concurrency', type=int, default=64, help='Concurrent clients')
+    parser.add_argument('--threads', type=int, default=8, help='WSGI server threads')
+    parser.add_argument('--client-delay', type=float, default=0.005,
+                        help='Seconds a slow client spends receiving each response')
+    parser.add_argument('--json', help='Write the results to this file')
+    args = parser.parse_args()
+
+    setup(args.db)
+    seed_catalog(args.products)
+    _, token = seed_user('bench@gmail.com', favorites=args.favorites)
+    headers = {'HTTP_AUTHORIZATION': 'Token ' + token.key}
+
+    from root.asgi import application as asgi_app
+    from root.wsgi import application as wsgi_app
+
+    rows = []
+    for name, (sync_path, async_path) in ENDPOINTS.items():
+        for mode, path in (('wsgi', sync_path), ('asgi-sync', sync_path), ('asgi-async', async_path)):
+            if mode == 'wsgi':
+                results, elapsed = run_wsgi(wsgi_app, path, headers, args.requests, args.threads,
+                                            args.client_delay)
+            else:
+                results, elapsed = asyncio.run(run_asgi(asgi_app, path, headers, args.requests,
+                                                        args.concurrency, args.client_delay))
+            errors = sum(1 for _, status in results if not str(status).startswith('2'))
+            rows.append(summarize([latency for latency, _ in results], elapsed,
+                                  endpoint=name, mode=mode, errors=errors))
+
+    print_table(rows, ['endpoint', 'mode', 'ops_per_sec', 'p50_ms', 'p99_ms', 'errors'])
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump(rows, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+import os
+import statistics
+
+import django
+
+
+def setup(db_path=None):
+    """
+    Поднимает Django с benchmarks.settings и применяет миграции к файлу БД бенчмарка.
+    """
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+    if db_path:
+        os.environ['BENCH_DB'] = str(db_path)
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def seed_catalog(size, batch_size=10000):
+    """
+    Доводит каталог до `size` товаров (уже созданные переиспользуются).
+    """
+    from product.models import Product
+    from product.stats import rebuild_price_stats
+
+    existing = Product.objects.count()
+    for start in range(existing, size, batch_size):
+        Product.objects.bulk_create([
+            Product(name='product %d' % i,
+                    description='Seeded product number %d for benchmarks' % i,
+                    price=100 + i % 9900)
+            for i in range(start, min(start + batch_size, size))
+        ])
+    # bulk_create не отправляет сигналы: сводку цен /products/stats/ строим заново
+    rebuild_price_stats()
+    return size
+
+
+def seed_user(email, favorites=0, password='bench4352'):
+    """
+    Пользователь с токеном и `favorites` товарами в Избранном.
+    """
+    from django.contrib.auth import get_user_model
+    from product.models import Product
+    from rest_framework.authtoken.models import Token
+
+    user_model = get_user_model()
+    user = user_model.objects.filter(email=email).first()
+    if user is None:
+        user = user_model.objects.create_user(username=email.split('@')[0], email=email, password=password)
+    if favorites:
+        ids = list(Product.objects.order_by('id').values_list('id', flat=True)[:favorites])
+        user.favorites.add(*ids)
+    token, _ = Token.objects.get_or_create(user=user)
+    return user, token
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies, elapsed, **extra):
+    """
+    Сводка по замеру: операций в секунду и перцентили задержки в миллисекундах.
+    """
+    result = {
+        'count': len(latencies),
+        'ops_per_sec': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+    }
+    result.update(extra)
+    return result
+
+
+def print_table(rows, columns):
+    widths = [max(len(str(column)), *(len(str(row.get(column, ''))) for row in rows)) for column in columns]
+    print('  '.join(str(column).ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(str(row.get(column, '')).ljust(width) for column, width in zip(columns, widths)))
+
+
+class QueryCounter:
+    """
+    Считает запросы ко всем БД внутри блока `with`. Не зависит от DEBUG и
+    от reset_queries(), который Django вызывает в начале каждого запроса.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        from contextlib import ExitStack
+        from django.db import connections
+
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+
+def describe_environment():
+    """
+    Версии и коммит, на которых сняты результаты: по ним compare понимает, что сравнивает.
+    """
+    import platform
+    import subprocess
+    import time
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'machine': platform.machine(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
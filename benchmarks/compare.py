@@ -0,0 +1,70 @@
+"""
+Compares two ``benchmarks.endpoints`` JSON results and flags regressions:
+throughput down or p99 latency up by more than ``--threshold``, or more
+queries per request. Exits with status 1 when anything regressed.
+
+    python -m benchmarks.compare base.json new.json --threshold 0.1
+"""
+import argparse
+import json
+
+from benchmarks.common import print_table
+
+
+def load(path):
+    with open(path) as source:
+        data = json.load(source)
+    return data.get('environment', {}), {(row['size'], row['endpoint']): row for row in data['results']}
+
+
+def change(base, new):
+    return (new - base) / base if base else 0.0
+
+
+def compare(base, new, threshold, min_ms):
+    rows = []
+    for key in sorted(base.keys() | new.keys()):
+        size, endpoint = key
+        if key not in base or key not in new:
+            rows.append({'size': size, 'endpoint': endpoint, 'status': 'only in ' + ('new' if key in new else 'base')})
+            continue
+        before, after = base[key], new[key]
+        ops = change(before['ops_per_sec'], after['ops_per_sec'])
+        p99 = change(before['p99_ms'], after['p99_ms'])
+        problems = []
+        if ops < -threshold:
+            problems.append('throughput')
+        # Для совсем быстрых запросов разница в доли миллисекунды - шум
+        if p99 > threshold and after['p99_ms'] - before['p99_ms'] > min_ms:
+            problems.append('p99')
+        if after['queries_per_op'] > before['queries_per_op']:
+            problems.append('queries')
+        rows.append({
+            'size': size, 'endpoint': endpoint,
+            'ops_per_sec': '%s -> %s (%+.1f%%)' % (before['ops_per_sec'], after['ops_per_sec'], ops * 100),
+            'p99_ms': '%s -> %s (%+.1f%%)' % (before['p99_ms'], after['p99_ms'], p99 * 100),
+            'queries_per_op': '%s -> %s' % (before['queries_per_op'], after['queries_per_op']),
+            'status': 'REGRESSION: ' + ', '.join(problems) if problems else 'ok',
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Allowed relative slowdown')
+    parser.add_argument('--min-ms', type=float, default=0.5, help='Ignore p99 changes smaller than this')
+    args = parser.parse_args()
+
+    base_env, base = load(args.base)
+    new_env, new = load(args.new)
+    print('base: %s  new: %s' % (base_env.get('commit'), new_env.get('commit')))
+    rows = compare(base, new, args.threshold, args.min_ms)
+    print_table(rows, ['size', 'endpoint', 'ops_per_sec', 'p99_ms', 'queries_per_op', 'status'])
+    if any(row['status'].startswith('REGRESSION') for row in rows):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
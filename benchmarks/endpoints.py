@@ -0,0 +1,160 @@
+"""
+Latency, throughput and query counts of every API endpoint at several catalog
+sizes. Requests go through the full Django stack in-process (test client,
+middleware, DRF), one at a time, so the numbers describe the cost of a single
+request rather than the server's concurrency.
+
+Sizes are seeded in ascending order into one SQLite file, growing the catalog
+between rounds; a benchmark user holds ``--favorites`` products in favorites.
+List, detail and stats are measured with an empty catalog cache (``list-cached`` shows
+the cache hit path). Save the results with ``--json`` and check them against an
+earlier run with ``python -m benchmarks.compare``.
+
+    python -m benchmarks.endpoints --sizes 1000 100000 1000000 --json bench.json
+"""
+import argparse
+import itertools
+import json
+import random
+import time
+import uuid
+
+from benchmarks.common import (QueryCounter, describe_environment, print_table, seed_catalog,
+                               seed_user, setup, summarize)
+
+ENDPOINTS = ('list', 'list-cached', 'detail', 'stats', 'register', 'login',
+             'favorites-add', 'favorites-list', 'favorites-delete')
+
+# Регистрация и вход упираются в PBKDF2, для них берется меньше повторов
+SLOW_ENDPOINTS = ('register', 'login')
+
+PASSWORD = 'bench4352'
+
+
+def measure(name, request, expected_status, iterations, warmup, before=None):
+    for _ in range(warmup):
+        if before is not None:
+            before()
+        request()
+    latencies = []
+    queries = 0
+    errors = 0
+    for _ in range(iterations):
+        if before is not None:
+            before()
+        with QueryCounter() as counter:
+            started = time.perf_counter()
+            response = request()
+            latencies.append(time.perf_counter() - started)
+        queries += counter.count
+        errors += response.status_code != expected_status
+    return summarize(latencies, sum(latencies), endpoint=name,
+                     queries_per_op=round(queries / iterations, 2) if iterations else 0.0, errors=errors)
+
+
+def build_requests(size, favorites, rounds):
+    """
+    {имя: (запрос без аргументов, ожидаемый статус, before)} для каталога размера size.
+    """
+    from django.urls import reverse
+    from product.cache import bump_catalog_version
+    from product.models import Product
+    from rest_framework.test import APIClient
+
+    user, token = seed_user('bench@gmail.com', favorites=favorites, password=PASSWORD)
+    client = APIClient()
+    auth_client = APIClient()
+    auth_client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+
+    ids = list(Product.objects.order_by('id').values_list('id', flat=True))
+    pick = random.Random(size)
+    # Товары, которых нет в Избранном: их добавляем, а потом удаляем в том же порядке
+    candidates = ids[favorites:favorites + rounds]
+    added = iter(candidates)
+    removed = iter(candidates)
+    unique = itertools.count()
+    run_id = uuid.uuid4().hex[:8]
+
+    def register():
+        number = next(unique)
+        return client.post(reverse('user-create'), {
+            'username': 'bench%s%d' % (run_id, number),
+            'email': 'bench-%s-%d@gmail.com' % (run_id, number),
+            'password': PASSWORD,
+        }, format='json')
+
+    return {
+        'list': (lambda: client.get(reverse('product-list-create'), {'page_size': 50}), 200,
+                 bump_catalog_version),
+        'list-cached': (lambda: client.get(reverse('product-list-create'), {'page_size': 50}), 200, None),
+        'detail': (lambda: client.get(reverse('product-detail', kwargs={'pk': pick.choice(ids)})), 200,
+                   bump_catalog_version),
+        'stats': (lambda: client.get(reverse('product-stats')), 200, bump_catalog_version),
+        'register': (register, 201, None),
+        'login': (lambda: client.post(reverse('login'), {'email': user.email, 'password': PASSWORD},
+                                      format='json'), 200, None),
+        'favorites-add': (lambda: auth_client.post(reverse('user-favorite'), {'product_id': next(added)},
+                                                   format='json'), 201, None),
+        'favorites-list': (lambda: auth_client.get(reverse('user-favorite')), 200, None),
+        'favorites-delete': (lambda: auth_client.delete(
+            reverse('user-favorite-delete', kwargs={'pk': next(removed)})), 204, None),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', help='SQLite file for the seeded catalog (reused between runs)')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--favorites', type=int, default=500, help='Products in the benchmark user favorites')
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint')
+    parser.add_argument('--slow-requests', type=int, default=30,
+                        help='Measured requests for %s' % ', '.join(SLOW_ENDPOINTS))
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument('--json', help='Write the results to this file')
+    args = parser.parse_args()
+
+    setup(args.db)
+    from django.core.cache import caches
+    from product.models import Product
+
+    sizes = sorted(set(args.sizes))
+    existing = Product.objects.count()
+    if existing > sizes[0]:
+        raise SystemExit('The database already holds %d products, more than --sizes %d; '
+                         'use a fresh --db' % (existing, sizes[0]))
+
+    rows = []
+    for size in sizes:
+        seed_catalog(size)
+        favorites = min(args.favorites, size // 2)
+        rounds = args.warmup + args.requests
+        # Каждый раунд favorites-add берет новый товар не из Избранного
+        if {'favorites-add', 'favorites-delete'} & set(args.endpoints) and size - favorites < rounds:
+            raise SystemExit('Catalog of %d products has %d outside the favorites, fewer than the %d '
+                             'favorites-add rounds; use a larger --sizes or fewer --requests/--warmup'
+                             % (size, size - favorites, rounds))
+        requests = build_requests(size, favorites, rounds)
+        for name in args.endpoints:
+            request, expected_status, before = requests[name]
+            iterations = args.slow_requests if name in SLOW_ENDPOINTS else args.requests
+            for cache in caches.all():
+                cache.clear()
+            result = measure(name, request, expected_status, iterations, args.warmup, before)
+            result.update(size=size, favorites=favorites)
+            rows.append(result)
+            print('%s/%s: %s ops/sec' % (size, name, result['ops_per_sec']), flush=True)
+
+    print_table(rows, ['size', 'endpoint', 'ops_per_sec', 'p50_ms', 'p99_ms', 'queries_per_op', 'errors'])
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump({
+                'environment': describe_environment(),
+                'options': {'requests': args.requests, 'slow_requests': args.slow_requests,
+                            'warmup': args.warmup, 'favorites': args.favorites},
+                'results': rows,
+            }, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+"""
+HTTP load generator for a running server (``runserver``, gunicorn, uvicorn...).
+
+Each virtual user is a thread with its own keep-alive ``requests.Session``:
+it registers, logs in and then performs a weighted mix of actions
+
+* ``browse``   - a few pages of /products/ following the cursor, then a product;
+* ``login``    - POST /login/;
+* ``favorite`` - add a product to favorites, list them, sometimes remove one;
+* ``logout``   - POST /logout/ and log in again.
+
+Throughput, latency percentiles and error rates are reported per endpoint.
+All virtual users come from one address, so start the server with
+``AUTH_THROTTLE_DISABLED=1`` unless the login rate limits are what you measure.
+The generated actions can be saved with ``--record`` and replayed later with
+the same per-user order and timing with ``--replay``.
+
+    python -m benchmarks.load --users 50 --duration 60 --mix browse=70,favorite=20,login=5,logout=5
+    python -m benchmarks.load --users 50 --duration 60 --record traffic.jsonl
+    python -m benchmarks.load --replay traffic.jsonl --speed 2
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import requests
+
+from benchmarks.common import print_table, summarize
+from constants import API
+
+DEFAULT_MIX = 'browse=70,favorite=20,login=5,logout=5'
+PASSWORD = 'load4352'
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in VirtualUser.ACTIONS:
+            raise argparse.ArgumentTypeError('Unknown action %r, expected one of %s'
+                                             % (name, ', '.join(VirtualUser.ACTIONS)))
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class Urls:
+    """
+    Адреса из constants.API; --base-url подменяет схему и хост.
+    """
+
+    def __init__(self, base_url=None):
+        for name in ('PRODUCT_URL', 'REGISTER_URL', 'LOGIN_URL', 'LOGOUT_URL', 'FAVORITE_URL'):
+            url = getattr(API, name)
+            if base_url:
+                url = base_url.rstrip('/') + urlsplit(url).path
+            setattr(self, name.lower(), url)
+
+
+class Recorder:
+
+    def __init__(self, path):
+        self._output = open(path, 'w')
+        self._lock = threading.Lock()
+
+    def write(self, user, offset, action, args):
+        line = json.dumps({'user': user, 'offset': round(offset, 4), 'action': action, 'args': args})
+        with self._lock:
+            self._output.write(line + '\n')
+
+    def close(self):
+        self._output.close()
+
+
+class VirtualUser:
+    ACTIONS = ('browse', 'login', 'favorite', 'logout')
+
+    def __init__(self, number, urls, run_id, timeout):
+        self.number = number
+        self.urls = urls
+        self.email = 'load-%s-%d@gmail.com' % (run_id, number)
+        self.username = 'load%s%d' % (run_id, number)
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.random = random.Random('%s-%d' % (run_id, number))
+        self.product_ids = []
+        self.favorites = []
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def call(self, endpoint, method, url, expected, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+        except requests.RequestException:
+            response = None
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        if response is None or response.status_code != expected:
+            self.errors[endpoint] += 1
+            return None
+        return response
+
+    def start(self):
+        response = self.call('register', 'POST', self.urls.register_url, 201,
+                             json={'username': self.username, 'email': self.email, 'password': PASSWORD})
+        if response is None:
+            return False
+        self.login({})
+        self.browse({'pages': 1, 'detail': False})
+        return True
+
+    def plan(self, action):
+        """
+        Параметры действия выбираются заранее, чтобы их можно было записать и повторить.
+        """
+        if action == 'browse':
+            return {'pages': self.random.randint(1, 3), 'detail': self.random.random() < 0.5}
+        if action == 'favorite':
+            product_id = self.random.choice(self.product_ids) if self.product_ids else None
+            remove = bool(self.favorites) and self.random.random() < 0.3
+            return {'product_id': product_id, 'remove': remove}
+        return {}
+
+    def perform(self, action, args):
+        getattr(self, action)(args)
+
+    def browse(self, args):
+        url = self.urls.product_url
+        for _ in range(args['pages']):
+            response = self.call('product-list', 'GET', url, 200)
+            if response is None:
+                return
+            data = response.json()
+            self.product_ids = [product['id'] for product in data['results']] or self.product_ids
+            url = data.get('next')
+            if not url:
+                break
+        if args['detail'] and self.product_ids:
+            product_id = self.random.choice(self.product_ids)
+            self.call('product-detail', 'GET', '%s%d/' % (self.urls.product_url, product_id), 200)
+
+    def login(self, args):
+        response = self.call('login', 'POST', self.urls.login_url, 200,
+                             json={'email': self.email, 'password': PASSWORD})
+        if response is not None:
+            self.session.headers['Authorization'] = 'Token ' + response.json()['token']
+
+    def logout(self, args):
+        self.call('logout', 'POST', self.urls.logout_url, 200)
+        self.session.headers.pop('Authorization', None)
+        self.login(args)
+
+    def favorite(self, args):
+        product_id = args['product_id']
+        if product_id is not None and product_id not in self.favorites:
+            if self.call('favorite-add', 'POST', self.urls.favorite_url, 201,
+                         json={'product_id': product_id}) is not None:
+                self.favorites.append(product_id)
+        self.call('favorite-list', 'GET', self.urls.favorite_url, 200)
+        if args['remove'] and self.favorites:
+            removed = self.favorites.pop(0)
+            self.call('favorite-delete', 'DELETE', '%s%d/' % (self.urls.favorite_url, removed), 204)
+
+
+def generate(user, mix, deadline, think, started, recorder):
+    actions = list(mix)
+    weights = [mix[action] for action in actions]
+    while time.monotonic() < deadline:
+        action = user.random.choices(actions, weights)[0]
+        args = user.plan(action)
+        if recorder is not None:
+            recorder.write(user.number, time.monotonic() - started, action, args)
+        user.perform(action, args)
+        if think:
+            time.sleep(user.random.expovariate(1 / think))
+
+
+def replay(user, actions, speed, started):
+    for entry in actions:
+        delay = started + entry['offset'] / speed - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        user.perform(entry['action'], entry['args'])
+
+
+def report(users, elapsed):
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    for user in users:
+        for endpoint, values in user.latencies.items():
+            latencies[endpoint].extend(values)
+        for endpoint, count in user.errors.items():
+            errors[endpoint] += count
+    rows = []
+    for endpoint in sorted(latencies):
+        values = latencies[endpoint]
+        rows.append(summarize(values, elapsed, endpoint=endpoint, errors=errors[endpoint],
+                              error_rate='%.2f%%' % (100 * errors[endpoint] / len(values))))
+    everything = [value for values in latencies.values() for value in values]
+    total_errors = sum(errors.values())
+    rows.append(summarize(everything, elapsed, endpoint='total', errors=total_errors,
+                          error_rate='%.2f%%' % (100 * total_errors / len(everything) if everything else 0)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', help='Server to load instead of the host in constants.API')
+    parser.add_argument('--users', type=int, default=10, help='Concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds of generated traffic')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help='Action weights, default %s' % DEFAULT_MIX)
+    parser.add_argument('--think', type=float, default=0.0, help='Mean pause between actions of a user')
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--record', help='Save the generated actions to this JSONL file')
+    parser.add_argument('--replay', help='Replay actions recorded with --record')
+    parser.add_argument('--speed', type=float, default=1.0, help='Replay speed factor')
+    parser.add_argument('--json', help='Write the results to this file')
+    args = parser.parse_args()
+
+    urls = Urls(args.base_url)
+    run_id = uuid.uuid4().hex[:8]
+    recorded = None
+    if args.replay:
+        recorded = defaultdict(list)
+        with open(args.replay) as source:
+            for line in source:
+                entry = json.loads(line)
+                recorded[entry['user']].append(entry)
+        numbers = sorted(recorded)
+    else:
+        numbers = list(range(args.users))
+
+    users = [VirtualUser(number, urls, run_id, args.timeout) for number in numbers]
+    # Регистрация и первый вход идут до замера нагрузки, но попадают в статистику
+    failed = [user for user in users if not user.start()]
+    if failed:
+        raise SystemExit('Could not register %d virtual users at %s' % (len(failed), urls.register_url))
+
+    recorder = Recorder(args.record) if args.record else None
+    started = time.monotonic()
+    threads = []
+    for user in users:
+        if recorded is not None:
+            target, target_args = replay, (user, recorded[user.number], args.speed, started)
+        else:
+            target, target_args = generate, (user, args.mix, started + args.duration, args.think, started, recorder)
+        threads.append(threading.Thread(target=target, args=target_args, daemon=True))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    if recorder is not None:
+        recorder.close()
+
+    rows = report(users, elapsed)
+    print_table(rows, ['endpoint', 'count', 'ops_per_sec', 'p50_ms', 'p99_ms', 'errors', 'error_rate'])
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump({'users': len(users), 'elapsed': round(elapsed, 3), 'results': rows}, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Startup and per-request overhead of the settings profiles:
+
+* ``root.settings``     - full project (admin, sessions, messages, static files, templates);
+* ``root.settings_api`` - API-only profile.
+
+Every run is a fresh process that times building the WSGI application
+(``django.setup()`` plus loading the middleware) and counts imported modules,
+then sends requests straight to the WSGI handler and reports the mean and
+median time per request. Startup numbers are the median of ``--runs`` processes.
+
+    python -m benchmarks.profiles --runs 5 --requests 2000
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import print_table, seed_catalog, setup
+
+PROFILES = ('root.settings', 'root.settings_api')
+
+ENDPOINTS = {
+    'product-list': '/products/?page_size=20',
+    'product-detail': '/products/1/',
+    'favorites-anonymous': '/favorite/',
+}
+
+
+def child(profile, db_path, requests):
+    os.environ['DJANGO_SETTINGS_MODULE'] = profile
+    started = time.perf_counter()
+    from django.core.wsgi import get_wsgi_application
+    application = get_wsgi_application()
+    startup = time.perf_counter() - started
+
+    from django.conf import settings
+    from django.test import RequestFactory
+
+    # Файл БД бенчмарка подставляется до первого обращения к соединению
+    settings.DATABASES['default']['NAME'] = db_path
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['*']
+
+    factory = RequestFactory()
+    result = {
+        'profile': profile,
+        'startup_ms': round(startup * 1000, 2),
+        'modules': len(sys.modules),
+        'apps': len(settings.INSTALLED_APPS),
+        'middleware': len(settings.MIDDLEWARE),
+        'requests': {},
+    }
+    for name, url in ENDPOINTS.items():
+        path, _, query = url.partition('?')
+        latencies = []
+        statuses = set()
+        for number in range(requests + requests // 10):
+            environ = factory.get(path, QUERY_STRING=query).environ
+            request_started = time.perf_counter()
+            response = application(environ, lambda status, headers, exc_info=None: statuses.add(status[:3]))
+            b''.join(response)
+            response.close()
+            # первые 10% - прогрев (кэш каталога, ленивые импорты)
+            if number >= requests // 10:
+                latencies.append(time.perf_counter() - request_started)
+        result['requests'][name] = {
+            'mean_us': round(statistics.fmean(latencies) * 1e6, 1),
+            'p50_us': round(statistics.median(latencies) * 1e6, 1),
+            'statuses': sorted(statuses),
+        }
+    print(json.dumps(result))
+
+
+def run_profile(profile, db_path, requests):
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.profiles', '--child', profile, '--db', db_path,
+         '--requests', str(requests)],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', help='SQLite file for the seeded catalog')
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--runs', type=int, default=5, help='Processes per profile')
+    parser.add_argument('--requests', type=int, default=2000, help='Measured requests per endpoint')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--json', help='Write the results to this file')
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.db, args.requests)
+        return
+
+    setup(args.db)
+    seed_catalog(args.products)
+    from django.conf import settings
+    db_path = str(settings.DATABASES['default']['NAME'])
+
+    startup_rows = []
+    request_rows = []
+    for profile in PROFILES:
+        runs = [run_profile(profile, db_path, args.requests) for _ in range(args.runs)]
+        startup_rows.append({
+            'profile': profile,
+            'startup_ms': round(statistics.median(run['startup_ms'] for run in runs), 2),
+            'modules': runs[0]['modules'],
+            'apps': runs[0]['apps'],
+            'middleware': runs[0]['middleware'],
+        })
+        for name in ENDPOINTS:
+            request_rows.append({
+                'profile': profile,
+                'endpoint': name,
+                'mean_us': round(statistics.median(run['requests'][name]['mean_us'] for run in runs), 1),
+                'p50_us': round(statistics.median(run['requests'][name]['p50_us'] for run in runs), 1),
+                'statuses': ','.join(runs[0]['requests'][name]['statuses']),
+            })
+
+    print_table(startup_rows, ['profile', 'startup_ms', 'modules', 'apps', 'middleware'])
+    print()
+    print_table(request_rows, ['profile', 'endpoint', 'mean_us', 'p50_us', 'statuses'])
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump({'startup': startup_rows, 'requests': request_rows}, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Rows per second of ProductSerializer (model instances) against
+ProductReadSerializer (``.values()`` rows) for product list payloads.
+Both the full read (query + serialization + JSON rendering) and
+serialization alone are measured, and the rendered JSON is checked
+to be byte-identical.
+
+    python -m benchmarks.serializers --products 100000 --rows 10000
+"""
+import argparse
+import json
+import time
+
+from benchmarks.common import print_table, seed_catalog, setup
+
+
+def measure(func, rows, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return round(rows / best)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', help='SQLite file for the seeded catalog')
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--rows', type=int, default=10000, help='Rows per serialized payload')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help='Write the results to this file')
+    args = parser.parse_args()
+
+    setup(args.db)
+    seed_catalog(args.products)
+
+    from product.models import Product
+    from product.serializers import ProductReadSerializer, ProductSerializer
+    from rest_framework.renderers import JSONRenderer
+
+    renderer = JSONRenderer()
+    queryset = Product.objects.order_by('id')[:args.rows]
+    values = Product.objects.order_by('id').values(*ProductReadSerializer.fields)[:args.rows]
+
+    model_payload = renderer.render(ProductSerializer(queryset, many=True).data)
+    fast_payload = renderer.render(ProductReadSerializer(values, many=True).data)
+    if model_payload != fast_payload:
+        raise SystemExit('ProductReadSerializer output differs from ProductSerializer')
+
+    instances = list(queryset)
+    rows = list(values)
+    results = [
+        {
+            'serializer': 'ProductSerializer',
+            'end_to_end_rows_per_sec': measure(
+                lambda: renderer.render(ProductSerializer(queryset.all(), many=True).data), args.rows, args.repeat),
+            'serialize_rows_per_sec': measure(
+                lambda: ProductSerializer(instances, many=True).data, args.rows, args.repeat),
+        },
+        {
+            'serializer': 'ProductReadSerializer',
+            'end_to_end_rows_per_sec': measure(
+                lambda: renderer.render(ProductReadSerializer(values.all(), many=True).data), args.rows, args.repeat),
+            'serialize_rows_per_sec': measure(
+                lambda: ProductReadSerializer(rows, many=True).data, args.rows, args.repeat),
+        },
+    ]
+    for column in ('end_to_end_rows_per_sec', 'serialize_rows_per_sec'):
+        results[1][column.replace('rows_per_sec', 'speedup')] = round(results[1][column] / results[0][column], 2)
+
+    print_table(results, ['serializer', 'end_to_end_rows_per_sec', 'end_to_end_speedup',
+                          'serialize_rows_per_sec', 'serialize_speedup'])
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
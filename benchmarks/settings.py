@@ -0,0 +1,22 @@
+"""
+Settings for the benchmark scripts: the project settings pointed at a separate
+SQLite file, so seeded catalogs never touch the development database.
+"""
+import os
+
+from root.settings import *  # noqa: F401,F403
+from root.settings import AUTH_THROTTLE_RATES, BASE_DIR
+
+DEBUG = False
+
+ALLOWED_HOSTS = ['*']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('BENCH_DB', str(BASE_DIR / 'bench.sqlite3')),
+    }
+}
+
+# Бенчмарк входит и регистрируется сотни раз с одного адреса
+AUTH_THROTTLE_RATES = dict.fromkeys(AUTH_THROTTLE_RATES)
@@ -0,0 +1,62 @@
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from root.replicas import read_from_replica
+
+from .filters import ProductFilter
+from .models import Product
+from .pagination import KeysetPagination
+from .serializers import ProductReadSerializer
+
+
+def render_json(data, status_code=status.HTTP_200_OK):
+    # Тот же рендерер, что и у DRF-представлений: ответы побайтно совпадают
+    return HttpResponse(JSONRenderer().render(data), status=status_code,
+                        content_type='application/json')
+
+
+def render_error(exc):
+    # Как rest_framework.views.exception_handler
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = render_json(data, exc.status_code)
+    auth_header = getattr(exc, 'auth_header', None)
+    if auth_header:
+        response['WWW-Authenticate'] = auth_header
+    if getattr(exc, 'wait', None):
+        response['Retry-After'] = '%d' % exc.wait
+    return response
+
+
+class AsyncProductListView(View):
+    """
+    Асинхронный вариант GET /products/ для ASGI: те же фильтры, сортировка
+    и keyset-пагинация, но страница читается через `async for`.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        # DRF Request нужен только как обертка для query_params
+        drf_request = Request(request)
+        paginator = KeysetPagination()
+        try:
+            queryset = Product.objects.order_by('id').values(*ProductReadSerializer.fields)
+            queryset = ProductFilter().filter_queryset(drf_request, queryset, self)
+            with read_from_replica():
+                rows = await paginator.apaginate_queryset(queryset, drf_request, self)
+        except APIException as exc:
+            return render_error(exc)
+        data = ProductReadSerializer(rows, many=True).data
+        return render_json(paginator.get_paginated_response(data).data)
+
+
+class AsyncProductDetailView(View):
+
+    async def get(self, request, pk, *args, **kwargs):
+        try:
+            with read_from_replica():
+                product = await Product.objects.values(*ProductReadSerializer.fields).aget(pk=pk)
+        except Product.DoesNotExist:
+            return render_json({'detail': 'Not found.'}, status.HTTP_404_NOT_FOUND)
+        return render_json(ProductReadSerializer(product).data)
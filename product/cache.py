@@ -0,0 +1,109 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework.exceptions import APIException
+
+VERSION_KEY = 'catalog:version'
+
+
+def get_catalog_cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def get_version_cache():
+    return caches[settings.CATALOG_VERSION_CACHE_ALIAS]
+
+
+def get_catalog_version():
+    cache = get_version_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Начинаем с текущего времени, а не с 1: если ключ версии был вытеснен,
+        # старые записи под маленькими номерами не станут снова видимыми
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    # Новое значение вместо incr: в файловом кэше incr - это чтение и запись,
+    # и два воркера могли бы получить одну и ту же версию
+    version = max(time.time_ns(), (get_version_cache().get(VERSION_KEY) or 0) + 1)
+    get_version_cache().set(VERSION_KEY, version, timeout=None)
+    return version
+
+
+def get_payload_key(request):
+    # Ответ зависит от хоста (абсолютные ссылки пагинации), пути,
+    # query string и согласования формата (Accept)
+    raw = '%s|%s|%s' % (request.META.get('HTTP_HOST', ''), request.get_full_path(),
+                        request.META.get('HTTP_ACCEPT', ''))
+    digest = hashlib.sha1(raw.encode()).hexdigest()
+    return 'catalog:%s:%s' % (get_catalog_version(), digest)
+
+
+class CatalogCacheMixin:
+    """
+    Кэширует отрендеренные GET-ответы каталога под текущей версией каталога.
+    Версия увеличивается при любом изменении Product (см. product.signals),
+    поэтому старые записи просто перестают читаться.
+
+    Повторный GET с совпадающим If-None-Match получает 304 без обращения
+    к БД, сериализатору и без тела ответа.
+    """
+
+    def authenticates(self, request):
+        # Ответ из кэша не должен обходить проверку переданного токена:
+        # с неверным токеном запрос идет обычным путем и получает 401
+        if 'HTTP_AUTHORIZATION' not in request.META:
+            return True
+        try:
+            self.initialize_request(request).user
+        except APIException:
+            return False
+        return True
+
+    # Ответ для кэша читается с primary: реплика могла еще не догнать
+    # изменение, из-за которого сменилась версия, и устаревший ответ
+    # остался бы в кэше под новой версией до следующего изменения
+    filling_cache = False
+
+    def reads_from_replica(self, request):
+        return not self.filling_cache and super().reads_from_replica(request)
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET' or not self.authenticates(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        cache = get_catalog_cache()
+        key = get_payload_key(request)
+        entry = cache.get(key)
+        response = None
+        if entry is None:
+            self.filling_cache = True
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            response.render()
+            etag = '"%s"' % hashlib.sha1(response.content).hexdigest()
+            entry = (etag, response['Content-Type'], response.content)
+            cache.set(key, entry, settings.CATALOG_CACHE_TIMEOUT)
+
+        etag, content_type, content = entry
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            if '*' in etags or etag in etags:
+                not_modified = HttpResponseNotModified()
+                not_modified['ETag'] = etag
+                return not_modified
+
+        if response is None:
+            response = HttpResponse(content, content_type=content_type)
+            response['Vary'] = 'Accept'
+        response['ETag'] = etag
+        return response
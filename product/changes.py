@@ -0,0 +1,124 @@
+# Лента изменений каталога: GET /products/changes/?since=<курсор>. Изменения
+# моложе PRODUCT_CHANGES_LAG придерживаются до следующей синхронизации, чтобы
+# не пропустить транзакции, закоммиченные позже своего updated_at.
+import base64
+import binascii
+import datetime
+import json
+
+from django.conf import settings
+from django.db.models import BigIntegerField, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound
+
+from .models import Product, ProductTombstone
+from .serializers import ProductReadSerializer
+
+INVALID_CURSOR = 'Invalid cursor'
+
+
+class CursorExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'Cursor is older than the deletion log, sync again without "since".'
+    default_code = 'cursor_expired'
+
+
+def encode_cursor(upserts, deletions):
+    payload = {'u': upserts, 'd': deletions}
+    data = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_position(value):
+    if not isinstance(value, list) or len(value) != 2:
+        raise NotFound(INVALID_CURSOR)
+    moment, pk = value
+    moment = parse_datetime(moment) if isinstance(moment, str) else None
+    # Курсоры выдаются с часовым поясом; pk - в 64-битном диапазоне БД
+    if moment is None or timezone.is_naive(moment):
+        raise NotFound(INVALID_CURSOR)
+    if not (pk is None or isinstance(pk, int) and abs(pk) <= BigIntegerField.MAX_BIGINT):
+        raise NotFound(INVALID_CURSOR)
+    return moment, pk
+
+
+def decode_cursor(encoded):
+    try:
+        data = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+        payload = json.loads(data)
+        return decode_position(payload['u']), decode_position(payload['d'])
+    except (TypeError, ValueError, KeyError, binascii.Error):
+        raise NotFound(INVALID_CURSOR)
+
+
+def seek(queryset, field, position):
+    # (field, id) > (moment, pk); без pk - строго позже moment
+    moment, pk = position
+    condition = Q(**{field + '__gt': moment})
+    if pk is not None:
+        condition |= Q(**{field: moment, 'id__gt': pk})
+    return queryset.filter(Q(**{field + '__gte': moment}) & condition)
+
+
+def format_position(moment, pk):
+    return [moment.isoformat(), pk]
+
+
+class ChangeFeed:
+
+    def __init__(self, since=None, limit=500):
+        self.since = since
+        self.limit = limit
+
+    def read(self):
+        watermark = timezone.now() - datetime.timedelta(seconds=settings.PRODUCT_CHANGES_LAG)
+        if self.since:
+            upserts_position, deletions_position = decode_cursor(self.since)
+            retention = datetime.timedelta(days=settings.PRODUCT_TOMBSTONE_RETENTION_DAYS)
+            if deletions_position[0] < timezone.now() - retention:
+                raise CursorExpired()
+        else:
+            # Первая синхронизация: удаления из прошлого клиенту не нужны
+            upserts_position, deletions_position = None, (watermark, None)
+
+        upserts = Product.objects.filter(updated_at__lte=watermark)
+        if upserts_position is not None:
+            upserts = seek(upserts, 'updated_at', upserts_position)
+        upserts = list(upserts.order_by('updated_at', 'id')
+                       .values(*ProductReadSerializer.fields, 'updated_at')[:self.limit + 1])
+
+        deletions = seek(ProductTombstone.objects.filter(deleted_at__lte=watermark),
+                         'deleted_at', deletions_position)
+        deletions = list(deletions.order_by('deleted_at', 'id')
+                         .values('id', 'product_id', 'deleted_at')[:self.limit + 1])
+
+        has_more = len(upserts) > self.limit or len(deletions) > self.limit
+        upserts, deletions = upserts[:self.limit], deletions[:self.limit]
+        return {
+            'upserts': ProductReadSerializer(upserts, many=True).data,
+            'deletions': [row['product_id'] for row in deletions],
+            'next': encode_cursor(
+                self.next_position(upserts, 'updated_at', watermark),
+                self.next_position(deletions, 'deleted_at', watermark),
+            ),
+            'has_more': has_more,
+        }
+
+    def next_position(self, rows, field, watermark):
+        if len(rows) == self.limit:
+            return format_position(rows[-1][field], rows[-1]['id'])
+        # Поток прочитан до конца: все, что не позже watermark, клиент уже видел
+        return format_position(watermark, None)
+
+
+def prune_tombstones(days=None):
+    """
+    Удаляет следы удалений старше срока хранения; курсоры старше него получат 410.
+    """
+    if days is None:
+        days = settings.PRODUCT_TOMBSTONE_RETENTION_DAYS
+    horizon = timezone.now() - datetime.timedelta(days=days)
+    deleted, _ = ProductTombstone.objects.filter(deleted_at__lt=horizon).delete()
+    return deleted
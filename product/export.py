@@ -0,0 +1,60 @@
+import json
+
+from .models import Product
+from .serializers import ProductReadSerializer
+
+FORMATS = ('ndjson', 'json')
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+# Тот же компактный вид, что и у JSONRenderer в DRF
+encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def iter_products(chunk_size=2000):
+    """
+    Читает каталог кусками по `chunk_size` строк через серверный курсор,
+    без создания экземпляров моделей: в памяти всегда не больше одного куска.
+    """
+    serializer = ProductReadSerializer()
+    rows = Product.objects.order_by('id').values(*ProductReadSerializer.fields)
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield serializer.to_representation(row)
+
+
+def stream_ndjson(rows, rows_per_chunk=500):
+    buffer = []
+    for row in rows:
+        buffer.append(encoder.encode(row))
+        if len(buffer) >= rows_per_chunk:
+            yield '\n'.join(buffer) + '\n'
+            buffer = []
+    if buffer:
+        yield '\n'.join(buffer) + '\n'
+
+
+def stream_json_array(rows, rows_per_chunk=500):
+    yield '['
+    separator = ''
+    buffer = []
+    for row in rows:
+        buffer.append(encoder.encode(row))
+        if len(buffer) >= rows_per_chunk:
+            yield separator + ','.join(buffer)
+            separator = ','
+            buffer = []
+    if buffer:
+        yield separator + ','.join(buffer)
+    yield ']'
+
+
+STREAMS = {
+    'ndjson': stream_ndjson,
+    'json': stream_json_array,
+}
+
+
+def export_products(output_format='ndjson', chunk_size=2000):
+    return STREAMS[output_format](iter_products(chunk_size=chunk_size))
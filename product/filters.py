@@ -0,0 +1,49 @@
+from decimal import Decimal, InvalidOperation
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+class ProductFilter(BaseFilterBackend):
+    """
+    Фильтр по цене (?min_price=, ?max_price=) и сортировка (?ordering=).
+    Каждая сортировка заканчивается на id, чтобы порядок был уникальным
+    для keyset-пагинации и совпадал с составными индексами (price, id) и (name, id).
+    """
+    ordering_param = 'ordering'
+    orderings = {
+        'id': ('id',),
+        '-id': ('-id',),
+        'price': ('price', 'id'),
+        '-price': ('-price', '-id'),
+        'name': ('name', 'id'),
+        '-name': ('-name', '-id'),
+    }
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        min_price = self.get_price(params, 'min_price')
+        max_price = self.get_price(params, 'max_price')
+        if min_price is not None:
+            queryset = queryset.filter(price__gte=min_price)
+        if max_price is not None:
+            queryset = queryset.filter(price__lte=max_price)
+
+        ordering = params.get(self.ordering_param)
+        if ordering:
+            if ordering not in self.orderings:
+                raise ValidationError({self.ordering_param: 'Allowed values: %s.' % ', '.join(self.orderings)})
+            queryset = queryset.order_by(*self.orderings[ordering])
+        return queryset
+
+    def get_price(self, params, name):
+        value = params.get(name)
+        if value in (None, ''):
+            return None
+        try:
+            price = Decimal(value)
+        except InvalidOperation:
+            raise ValidationError({name: 'A valid number is required.'})
+        if not price.is_finite():
+            raise ValidationError({name: 'A valid number is required.'})
+        return price
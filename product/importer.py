@@ -0,0 +1,143 @@
+import codecs
+import csv
+import json
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from .cache import bump_catalog_version
+from .models import Product
+from .serializers import ProductSerializer
+from .stats import record_price_changes
+
+FORMATS = ('csv', 'jsonl')
+UPSERT_KEYS = ('name',)
+WRITE_FIELDS = ('name', 'description', 'price')
+
+
+# Неверные байты заменяются на U+FFFD, и такая строка попадает в отчет об ошибках
+INVALID_ENCODING = 'Row is not valid UTF-8.'
+
+
+def decode_lines(stream, encoding='utf-8'):
+    # Построчное декодирование, многобайтные символы на границах строк не ломаются
+    return codecs.iterdecode(stream, encoding, errors='replace')
+
+
+def has_invalid_bytes(row):
+    return any(isinstance(value, str) and '\ufffd' in value
+               for item in row.items() for value in item)
+
+
+def read_csv(lines):
+    yield from csv.DictReader(lines)
+
+
+def read_jsonl(lines):
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as exc:
+            yield exc
+
+
+READERS = {
+    'csv': read_csv,
+    'jsonl': read_jsonl,
+}
+
+
+class ProductImporter:
+    """
+    Потоковая загрузка товаров. Каждая строка проверяется теми же правилами,
+    что и POST /products/ (ProductSerializer), валидные строки пишутся пачками
+    через bulk_create/bulk_update, каждая пачка в своей транзакции.
+    Ошибочные строки попадают в отчет и не прерывают загрузку.
+
+    С `upsert_key` существующие товары с тем же значением ключа обновляются.
+    """
+
+    def __init__(self, batch_size=1000, upsert_key=None, max_errors=1000):
+        if upsert_key is not None and upsert_key not in UPSERT_KEYS:
+            raise ValueError('Unsupported upsert key: %s' % upsert_key)
+        self.batch_size = batch_size
+        self.upsert_key = upsert_key
+        self.max_errors = max_errors
+        # Один экземпляр на всю загрузку: поля сериализатора строятся один раз
+        self.serializer = ProductSerializer()
+        self.report = {'created': 0, 'updated': 0, 'failed': 0, 'errors': []}
+
+    def run(self, rows):
+        batch = []
+        for number, row in enumerate(rows, start=1):
+            product = self.validate(number, row)
+            if product is None:
+                continue
+            batch.append(product)
+            if len(batch) >= self.batch_size:
+                self.write(batch)
+                batch = []
+        if batch:
+            self.write(batch)
+
+        # bulk_create/bulk_update не отправляют post_save, сбрасываем кэш каталога сами
+        if self.report['created'] or self.report['updated']:
+            bump_catalog_version()
+        return self.report
+
+    def validate(self, number, row):
+        try:
+            if isinstance(row, Exception):
+                raise serializers.ValidationError({'non_field_errors': [str(row)]})
+            if isinstance(row, dict) and has_invalid_bytes(row):
+                raise serializers.ValidationError({'non_field_errors': [INVALID_ENCODING]})
+            data = self.serializer.run_validation(row)
+        except serializers.ValidationError as exc:
+            self.report['failed'] += 1
+            if len(self.report['errors']) < self.max_errors:
+                self.report['errors'].append({'row': number, 'errors': exc.detail})
+            return None
+        return Product(**{field: data[field] for field in WRITE_FIELDS})
+
+    def write(self, batch):
+        with transaction.atomic():
+            if self.upsert_key is None:
+                Product.objects.bulk_create(batch)
+                # bulk-операции не отправляют сигналы, сводку цен обновляем сами
+                record_price_changes(added=[product.price for product in batch])
+                self.report['created'] += len(batch)
+                return
+
+            key = self.upsert_key
+            # При повторе ключа внутри пачки побеждает последняя строка
+            by_key = {getattr(product, key): product for product in batch}
+            existing = {
+                value: (pk, price) for value, pk, price in
+                Product.objects.filter(**{key + '__in': list(by_key)}).values_list(key, 'id', 'price')
+            }
+            to_create, to_update, old_prices = [], [], []
+            for value, product in by_key.items():
+                if value in existing:
+                    product.id, old_price = existing[value]
+                    old_prices.append(old_price)
+                    to_update.append(product)
+                else:
+                    to_create.append(product)
+
+            if to_update:
+                # bulk_update не применяет auto_now, время изменения ставим сами
+                now = timezone.now()
+                for product in to_update:
+                    product.updated_at = now
+                fields = [field for field in WRITE_FIELDS if field != key] + ['updated_at']
+                Product.objects.bulk_update(to_update, fields)
+            if to_create:
+                Product.objects.bulk_create(to_create)
+            record_price_changes(added=[product.price for product in to_update + to_create],
+                                 removed=old_prices)
+            self.report['created'] += len(to_create)
+            self.report['updated'] += len(to_update)
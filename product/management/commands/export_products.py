@@ -0,0 +1,32 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from product.export import FORMATS, export_products
+
+
+class Command(BaseCommand):
+    help = 'Streams the whole catalog as NDJSON or a JSON array'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('-o', '--output', default='-', help="Output file, '-' writes to stdout")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+        chunks = export_products(options['format'], chunk_size=options['chunk_size'])
+
+        if options['output'] == '-':
+            self.write(self.stdout, chunks)
+            return
+        try:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                self.write(output, chunks)
+        except OSError as exc:
+            raise CommandError(exc)
+
+    def write(self, output, chunks):
+        for chunk in chunks:
+            output.write(chunk)
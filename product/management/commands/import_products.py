@@ -0,0 +1,51 @@
+import json
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from product.importer import FORMATS, READERS, UPSERT_KEYS, ProductImporter, decode_lines
+
+
+class Command(BaseCommand):
+    help = 'Streams products from a CSV or JSONL file into the catalog in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Path to the input file, '-' reads stdin")
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Input format, guessed from the file extension by default')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--upsert-key', choices=UPSERT_KEYS,
+                            help='Update existing products matching this field instead of inserting')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format'] or self.guess_format(path)
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        importer = ProductImporter(batch_size=options['batch_size'],
+                                   upsert_key=options['upsert_key'])
+        # Файл читается байтами: строки с неверным UTF-8 попадают в отчет, а не прерывают загрузку
+        if path == '-':
+            report = importer.run(READERS[input_format](decode_lines(sys.stdin.buffer)))
+        else:
+            try:
+                with open(path, 'rb') as stream:
+                    report = importer.run(READERS[input_format](decode_lines(stream)))
+            except OSError as exc:
+                raise CommandError(exc)
+
+        for error in report['errors']:
+            self.stderr.write(json.dumps(error))
+        self.stdout.write(self.style.SUCCESS(
+            'Created: {created}, updated: {updated}, failed: {failed}'.format(**report)
+        ))
+
+    def guess_format(self, path):
+        extension = os.path.splitext(path)[1].lstrip('.').lower()
+        if extension in ('jsonl', 'ndjson'):
+            return 'jsonl'
+        if extension == 'csv':
+            return 'csv'
+        raise CommandError('Cannot guess the format of %s, pass --format' % path)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from product.changes import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Deletes product deletion records older than PRODUCT_TOMBSTONE_RETENTION_DAYS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Override the retention period')
+
+    def handle(self, *args, **options):
+        if options['days'] is not None and options['days'] < 0:
+            raise CommandError('--days must not be negative')
+        deleted = prune_tombstones(days=options['days'])
+        self.stdout.write(self.style.SUCCESS('Deleted %d tombstone(s)' % deleted))
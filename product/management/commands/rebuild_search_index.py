@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from product.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the FTS5 product search index from the product_product table'
+
+    def handle(self, *args, **options):
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from product.similar import rebuild_similar_products
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the "also liked" co-occurrence index from the favorites table'
+
+    def handle(self, *args, **options):
+        pairs = rebuild_similar_products()
+        self.stdout.write(self.style.SUCCESS('Indexed %d product pair(s)' % pairs))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from product.popularity import reconcile_favorite_counts
+
+
+class Command(BaseCommand):
+    help = 'Recomputes Product.favorite_count from the favorites table in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+        fixed = reconcile_favorite_counts(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Fixed %d product(s)' % fixed))
@@ -0,0 +1,29 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = 'Copies the primary SQLite database into every configured read replica'
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('No replicas configured, set DATABASE_REPLICA_PATHS')
+
+        primary = connections['default'].settings_dict['NAME']
+        source = sqlite3.connect(str(primary))
+        try:
+            for alias in settings.DATABASE_REPLICAS:
+                connections[alias].close()
+                target = sqlite3.connect(str(connections[alias].settings_dict['NAME']))
+                try:
+                    # Online backup API: копия консистентна и не блокирует запись надолго
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write('Synced %s' % alias)
+        finally:
+            source.close()
+        self.stdout.write(self.style.SUCCESS('Replicas are up to date'))
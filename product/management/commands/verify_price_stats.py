@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from product.cache import bump_catalog_version
+from product.models import PriceBucket
+from product.stats import compute_price_buckets, rebuild_price_stats
+
+FIELDS = ('upper', 'count', 'total_cents', 'min_price', 'max_price')
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the price statistics from the products table and repairs the summary'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report differences and fail if there are any')
+
+    def handle(self, *args, **options):
+        stored = {bucket.lower: bucket for bucket in PriceBucket.objects.all()}
+        expected = compute_price_buckets()
+        mismatched = 0
+        for bucket in expected:
+            current = stored.pop(bucket.lower, None)
+            if current is None:
+                self.stdout.write('Bucket %s: missing' % bucket.lower)
+                mismatched += 1
+                continue
+            for field in FIELDS:
+                if getattr(current, field) != getattr(bucket, field):
+                    self.stdout.write('Bucket %s: %s is %s, expected %s' % (
+                        bucket.lower, field, getattr(current, field), getattr(bucket, field)))
+                    mismatched += 1
+        for lower in stored:
+            self.stdout.write('Bucket %s: not in PRODUCT_PRICE_BUCKETS' % lower)
+            mismatched += 1
+
+        if not mismatched:
+            self.stdout.write(self.style.SUCCESS('Price statistics are up to date'))
+            return
+        if options['check']:
+            raise CommandError('Found %d difference(s) in the price statistics' % mismatched)
+        rebuild_price_stats()
+        # Закэшированный /products/stats/ со старыми числами больше не отдается
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS('Fixed %d difference(s)' % mismatched))
@@ -0,0 +1,50 @@
+from django.db import migrations
+
+# SQL скопирован из product.search на момент миграции: дальнейшие правки
+# модуля не должны менять то, что делают уже примененные миграции
+CREATE_TABLE_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS product_search USING fts5("
+    "name, description, content='product_product', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')"
+)
+
+CREATE_TRIGGERS_SQL = [
+    "CREATE TRIGGER IF NOT EXISTS product_search_ai AFTER INSERT ON product_product BEGIN "
+    "INSERT INTO product_search(rowid, name, description) "
+    "VALUES (new.id, new.name, new.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS product_search_ad AFTER DELETE ON product_product BEGIN "
+    "INSERT INTO product_search(product_search, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS product_search_au AFTER UPDATE OF name, description "
+    "ON product_product BEGIN "
+    "INSERT INTO product_search(product_search, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO product_search(rowid, name, description) "
+    "VALUES (new.id, new.name, new.description); "
+    "END",
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS product_search_au',
+    'DROP TRIGGER IF EXISTS product_search_ad',
+    'DROP TRIGGER IF EXISTS product_search_ai',
+    'DROP TABLE IF EXISTS product_search',
+]
+
+REBUILD_SQL = "INSERT INTO product_search(product_search) VALUES ('rebuild')"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[CREATE_TABLE_SQL, *CREATE_TRIGGERS_SQL, REBUILD_SQL],
+            reverse_sql=DROP_SQL,
+        ),
+    ]
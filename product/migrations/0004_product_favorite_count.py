@@ -0,0 +1,70 @@
+# Generated by Django 4.2.3 on 2026-10-18 18:04
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+# SQL скопирован из product.search на момент миграции: дальнейшие правки
+# модуля не должны менять то, что делают уже примененные миграции
+CREATE_TRIGGERS_SQL = [
+    "CREATE TRIGGER IF NOT EXISTS product_search_ai AFTER INSERT ON product_product BEGIN "
+    "INSERT INTO product_search(rowid, name, description) "
+    "VALUES (new.id, new.name, new.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS product_search_ad AFTER DELETE ON product_product BEGIN "
+    "INSERT INTO product_search(product_search, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS product_search_au AFTER UPDATE OF name, description "
+    "ON product_product BEGIN "
+    "INSERT INTO product_search(product_search, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO product_search(rowid, name, description) "
+    "VALUES (new.id, new.name, new.description); "
+    "END",
+]
+
+
+def backfill_favorite_counts(apps, schema_editor):
+    # Как reconcile_favorite_counts: счетчики уже добавленного в Избранное
+    # считаются пачками по id, иначе удаление увело бы favorite_count ниже нуля
+    Product = apps.get_model('product', 'Product')
+    through = apps.get_model('user', 'User').favorites.through
+    actual_count = Coalesce(
+        Subquery(
+            through.objects.filter(product_id=OuterRef('pk'))
+            .order_by().values('product_id').annotate(count=Count('*')).values('count')
+        ),
+        Value(0),
+    )
+    last_id = 0
+    while True:
+        ids = list(Product.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:1000])
+        if not ids:
+            return
+        last_id = ids[-1]
+        Product.objects.filter(id__in=ids).update(favorite_count=actual_count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0003_product_price_name_indexes'),
+        ('user', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='favorite_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        # SQLite пересоздает таблицу при добавлении NOT NULL колонки,
+        # триггеры поискового индекса при этом удаляются
+        migrations.RunSQL(CREATE_TRIGGERS_SQL, reverse_sql=migrations.RunSQL.noop),
+        migrations.RunPython(backfill_favorite_counts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-favorite_count', 'id'], name='product_favorite_count_idx'),
+        ),
+    ]
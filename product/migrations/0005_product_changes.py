@@ -0,0 +1,57 @@
+# Generated by Django 4.2.3 on 2026-10-18 18:19
+
+from django.db import migrations, models
+import django.utils.timezone
+
+# SQL скопирован из product.search на момент миграции: дальнейшие правки
+# модуля не должны менять то, что делают уже примененные миграции
+CREATE_TRIGGERS_SQL = [
+    "CREATE TRIGGER IF NOT EXISTS product_search_ai AFTER INSERT ON product_product BEGIN "
+    "INSERT INTO product_search(rowid, name, description) "
+    "VALUES (new.id, new.name, new.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS product_search_ad AFTER DELETE ON product_product BEGIN "
+    "INSERT INTO product_search(product_search, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS product_search_au AFTER UPDATE OF name, description "
+    "ON product_product BEGIN "
+    "INSERT INTO product_search(product_search, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO product_search(rowid, name, description) "
+    "VALUES (new.id, new.name, new.description); "
+    "END",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0004_product_favorite_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        # Пересоздание таблицы в SQLite удаляет триггеры поискового индекса
+        migrations.RunSQL(CREATE_TRIGGERS_SQL, reverse_sql=migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['updated_at', 'id'], name='product_updated_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producttombstone',
+            index=models.Index(fields=['deleted_at', 'id'], name='product_tombstone_deleted_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.3 on 2026-10-18 18:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# SQL скопирован из product.similar на момент миграции: индекс строится
+# по уже существующему Избранному, иначе удаление старых "лайков" увело бы
+# счетчики пар ниже нуля
+BUILD_SQL = [
+    'INSERT INTO product_productcooccurrence (product_id, other_id, count) '
+    'SELECT a.product_id, b.product_id, COUNT(*) FROM user_user_favorites a '
+    'JOIN user_user_favorites b ON b.user_id = a.user_id AND b.product_id != a.product_id '
+    'GROUP BY a.product_id, b.product_id',
+    'INSERT INTO product_similarproduct (product_id, similar_id, score) '
+    'SELECT product_id, other_id, count FROM ('
+    'SELECT product_id, other_id, count, ROW_NUMBER() OVER '
+    '(PARTITION BY product_id ORDER BY count DESC, other_id) AS position '
+    'FROM product_productcooccurrence) WHERE position <= 20',
+]
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0005_product_changes'),
+        ('user', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveIntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='product.product')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='product.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', '-score', 'similar'], name='similar_product_score_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductCooccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField()),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='product.product')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='product.product')),
+            ],
+            options={
+                'unique_together': {('product', 'other')},
+            },
+        ),
+        # Индекс по уже существующему Избранному, top-K - SIMILAR_PRODUCTS_TOP_K на момент миграции
+        migrations.RunSQL(BUILD_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.3 on 2026-10-18 18:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0006_similar_products'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lower', models.DecimalField(decimal_places=2, max_digits=8, unique=True)),
+                ('upper', models.DecimalField(decimal_places=2, max_digits=8, null=True)),
+                ('count', models.IntegerField(default=0)),
+                ('total_cents', models.BigIntegerField(default=0)),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=8, null=True)),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=8, null=True)),
+            ],
+            options={
+                'ordering': ['lower'],
+            },
+        ),
+    ]
@@ -1,10 +1,93 @@
 from django.db import models
+from django.utils import timezone
 
 
 class Product(models.Model):
     name = models.CharField(max_length=200)
     description = models.TextField()
     price = models.DecimalField(max_digits=8, decimal_places=2)
+    # Денормализованный счетчик Избранного, обновляется по m2m_changed (user.signals)
+    favorite_count = models.PositiveIntegerField(default=0, editable=False)
+    # Время последнего изменения для ленты /products/changes/ (product.changes).
+    # QuerySet.update() и bulk_update его не трогают - выставляйте явно
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Составные индексы под фильтрацию/сортировку списка и keyset-пагинацию
+        indexes = [
+            models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+            models.Index(fields=['name', 'id'], name='product_name_id_idx'),
+            models.Index(fields=['-favorite_count', 'id'], name='product_favorite_count_idx'),
+            models.Index(fields=['updated_at', 'id'], name='product_updated_at_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
+
+
+class ProductTombstone(models.Model):
+    """
+    След удаленного товара: по нему лента изменений сообщает клиентам об удалении.
+    """
+    product_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='product_tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.product_id)
+
+
+class ProductCooccurrence(models.Model):
+    """
+    Сколько пользователей добавили в Избранное оба товара. Хранится в обе
+    стороны (product, other) и (other, product); поддерживается по m2m_changed
+    (product.similar), полностью пересчитывается rebuild_similar_products.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    # Не Positive: SQLite проверяет CHECK у вставляемой строки -1 еще до ON CONFLICT
+    count = models.IntegerField()
+
+    class Meta:
+        unique_together = ('product', 'other')
+
+
+class SimilarProduct(models.Model):
+    """
+    Top-K соседей товара по ProductCooccurrence: /products/<pk>/similar/
+    читает их одним проходом по индексу (product, -score, similar).
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    similar = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='similar_to')
+    score = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', '-score', 'similar'], name='similar_product_score_idx'),
+        ]
+
+
+class PriceBucket(models.Model):
+    """
+    Сводка цен каталога по корзинам PRODUCT_PRICE_BUCKETS для /products/stats/:
+    число товаров, сумма цен в копейках, минимум и максимум корзины.
+    Поддерживается по сигналам Product и импортом (product.stats).
+    """
+    lower = models.DecimalField(max_digits=8, decimal_places=2, unique=True)
+    upper = models.DecimalField(max_digits=8, decimal_places=2, null=True)  # None - без верхней границы
+    # Обычные (не Positive) поля: после правок в обход сигналов счетчик может
+    # уйти в минус, и удаление товара не должно из-за этого падать
+    count = models.IntegerField(default=0)
+    total_cents = models.BigIntegerField(default=0)
+    min_price = models.DecimalField(max_digits=8, decimal_places=2, null=True)
+    max_price = models.DecimalField(max_digits=8, decimal_places=2, null=True)
+
+    class Meta:
+        ordering = ['lower']
+
+    def __str__(self):
+        return str(self.lower)
@@ -0,0 +1,194 @@
+import base64
+import binascii
+import datetime
+import json
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import BigIntegerField, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) пагинация: следующая страница выбирается условием
+    `(f1, f2, ...) > (v1, v2, ...)` по значениям последней строки, поэтому
+    страница N стоит столько же, сколько первая. Ни OFFSET, ни COUNT(*)
+    не используются.
+
+    Порядок берется из `order_by` queryset'а (или `ordering`, если queryset
+    не упорядочен) и обязан быть уникальным, т.е. заканчиваться на `id`.
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    page_size = api_settings.PAGE_SIZE or 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('id',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.prepare(queryset, request)
+        rows = list(self.get_page_queryset(queryset))
+        return self.build_page(rows)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        # Для асинхронных представлений: страница читается через async ORM
+        self.prepare(queryset, request)
+        rows = [row async for row in self.get_page_queryset(queryset)]
+        return self.build_page(rows)
+
+    def prepare(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        self.position, self.reverse = self.decode_cursor(request)
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                size = int(request.query_params[self.page_size_query_param])
+            except (KeyError, ValueError):
+                pass
+            else:
+                if size > 0:
+                    return min(size, self.max_page_size)
+        return self.page_size
+
+    def get_ordering(self, queryset):
+        ordering = tuple(queryset.query.order_by)
+        return ordering or tuple(self.ordering)
+
+    def get_page_queryset(self, queryset):
+        """
+        Ленивый queryset одной страницы (+1 строка, чтобы узнать, есть ли
+        продолжение). Его можно вычислить как синхронно, так и через `async for`.
+        """
+        ordering = self.ordering
+        if self.reverse:
+            ordering = tuple(_invert(field) for field in ordering)
+        if self.position is not None:
+            try:
+                queryset = queryset.filter(self.get_seek_condition(ordering, self.position))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        return queryset.order_by(*ordering)[:self.page_size + 1]
+
+    def get_seek_condition(self, ordering, position):
+        # (f1, f2) > (v1, v2)  <=>  f1 > v1 OR (f1 = v1 AND f2 > v2)
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+
+        # Отдельное условие по первому полю позволяет SQLite сделать
+        # range scan по индексу вместо перебора всех строк
+        first = ordering[0]
+        lookup = 'lte' if first.startswith('-') else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{lookup}': position[0]}) & condition
+
+    def build_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+            has_next, has_previous = self.position is not None, has_more
+        else:
+            has_next, has_previous = has_more, self.position is not None
+
+        self.next_position = self.get_position(rows[-1]) if rows and has_next else None
+        self.previous_position = self.get_position(rows[0]) if rows and has_previous else None
+        return rows
+
+    def get_position(self, row):
+        position = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            if isinstance(value, Decimal):
+                value = str(value)
+            elif isinstance(value, (datetime.date, datetime.datetime)):
+                value = value.isoformat()
+            position.append(value)
+        return position
+
+    def encode_cursor(self, position, reverse=False):
+        payload = {'p': position}
+        if reverse:
+            payload['r'] = 1
+        data = json.dumps(payload, separators=(',', ':')).encode()
+        cursor = base64.urlsafe_b64encode(data).decode().rstrip('=')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            data = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+            payload = json.loads(data)
+            position = payload['p']
+            reverse = bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if (not isinstance(position, list) or len(position) != len(self.ordering)
+                or not all(isinstance(value, (str, int, float)) for value in position)):
+            raise NotFound(self.invalid_cursor_message)
+        # Целые вне 64-битного диапазона БД не принимает (OverflowError при запросе)
+        if any(isinstance(value, int) and abs(value) > BigIntegerField.MAX_BIGINT for value in position):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class SearchPagination(KeysetPagination):
+    """
+    Пагинация полнотекстового поиска (product.search.ProductSearch) по (rank, id).
+    """
+    ordering = ('rank', 'id')
+
+    def get_ordering(self, search):
+        return self.ordering
+
+    def get_page_queryset(self, search):
+        try:
+            return search.page(self.position, self.reverse, self.page_size + 1)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+def _invert(field):
+    return field[1:] if field.startswith('-') else '-' + field
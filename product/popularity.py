@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Product
+
+
+def adjust_favorite_counts(product_ids, delta):
+    # Атомарное изменение на стороне БД, без чтения текущего значения
+    if product_ids and delta:
+        Product.objects.filter(pk__in=product_ids).update(favorite_count=F('favorite_count') + delta)
+
+
+def reconcile_favorite_counts(batch_size=1000):
+    """
+    Пересчитывает favorite_count по through-таблице Избранного пачками по id.
+    Расхождения исправляются одним UPDATE с подзапросом на пачку, поэтому
+    параллельные изменения Избранного не теряются. Возвращает число
+    исправленных товаров.
+    """
+    through = get_user_model().favorites.through
+    actual_count = Coalesce(
+        Subquery(
+            through.objects.filter(product_id=OuterRef('pk'))
+            .order_by().values('product_id').annotate(count=Count('*')).values('count')
+        ),
+        Value(0),
+    )
+
+    fixed = 0
+    last_id = 0
+    while True:
+        ids = list(Product.objects.filter(id__gt=last_id).order_by('id')
+                   .values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return fixed
+        last_id = ids[-1]
+        stale = Product.objects.filter(id__in=ids).exclude(favorite_count=actual_count)
+        fixed += stale.update(favorite_count=actual_count)
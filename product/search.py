@@ -0,0 +1,94 @@
+import re
+
+from django.db import connection
+
+from .models import Product
+
+SEARCH_TABLE = 'product_search'
+
+# Вес совпадений в названии выше, чем в описании (аргументы bm25 по колонкам)
+RANK_SQL = 'bm25(%s, 10.0, 1.0)' % SEARCH_TABLE
+
+# External content FTS5: сами тексты хранятся только в product_product,
+# индекс синхронизируется триггерами при любых INSERT/UPDATE/DELETE,
+# в том числе при bulk_create и QuerySet.update
+CREATE_TABLE_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS product_search USING fts5("
+    "name, description, content='product_product', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')"
+)
+
+CREATE_TRIGGERS_SQL = [
+    "CREATE TRIGGER IF NOT EXISTS product_search_ai AFTER INSERT ON product_product BEGIN "
+    "INSERT INTO product_search(rowid, name, description) "
+    "VALUES (new.id, new.name, new.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS product_search_ad AFTER DELETE ON product_product BEGIN "
+    "INSERT INTO product_search(product_search, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS product_search_au AFTER UPDATE OF name, description "
+    "ON product_product BEGIN "
+    "INSERT INTO product_search(product_search, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO product_search(rowid, name, description) "
+    "VALUES (new.id, new.name, new.description); "
+    "END",
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS product_search_au',
+    'DROP TRIGGER IF EXISTS product_search_ad',
+    'DROP TRIGGER IF EXISTS product_search_ai',
+    'DROP TABLE IF EXISTS product_search',
+]
+
+REBUILD_SQL = "INSERT INTO product_search(product_search) VALUES ('rebuild')"
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def build_match_query(text):
+    """
+    Превращает пользовательский ввод в безопасный MATCH-запрос FTS5:
+    все слова обязательны, последнее ищется по префиксу ("jea" найдет "jeans").
+    Синтаксис FTS5 (кавычки, OR, NEAR, *) из ввода не пропускается.
+    """
+    tokens = TOKEN_RE.findall(text or '')
+    if not tokens:
+        return ''
+    terms = ['"%s"' % token for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def rebuild_search_index():
+    with connection.cursor() as cursor:
+        cursor.execute(REBUILD_SQL)
+
+
+class ProductSearch:
+    """
+    Ранжированный поиск по индексу FTS5 с keyset-пагинацией по (rank, id).
+    """
+
+    def __init__(self, query):
+        self.query = query
+
+    def page(self, position=None, reverse=False, limit=50):
+        table = SEARCH_TABLE
+        op, direction = ('<', 'DESC') if reverse else ('>', 'ASC')
+        sql = (
+            'SELECT p.id, p.name, p.description, p.price, {rank} AS rank '
+            'FROM {table} JOIN product_product p ON p.id = {table}.rowid '
+            'WHERE {table} MATCH %s'
+        ).format(rank=RANK_SQL, table=table)
+        params = [self.query]
+        if position is not None:
+            rank, pk = float(position[0]), int(position[1])
+            sql += ' AND ({rank} {op} %s OR ({rank} = %s AND p.id {op} %s))'.format(
+                rank=RANK_SQL, op=op)
+            params += [rank, rank, pk]
+        sql += ' ORDER BY rank {d}, p.id {d} LIMIT %s'.format(d=direction)
+        params.append(limit)
+        return Product.objects.raw(sql, params)
@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.db.models import BigIntegerField
 from rest_framework import serializers
 from .models import Product
 import string
@@ -20,3 +22,59 @@ class ProductSerializer(serializers.ModelSerializer):
         if price <= 0:
             raise serializers.ValidationError("The price should be a positive value.")
         return price
+
+
+class ProductReadSerializer(serializers.BaseSerializer):
+    """
+    Быстрый read-only сериализатор для строк `.values(*ProductReadSerializer.fields)`.
+    Не создает экземпляры моделей и не обходит поля по одному, но выдает
+    тот же JSON, что и ProductSerializer: цена форматируется тем же DecimalField.
+    Для записи по-прежнему используется ProductSerializer с его валидаторами.
+    """
+    fields = ProductSerializer.Meta.fields
+    _price_field = None
+
+    @classmethod
+    def get_price_field(cls):
+        if cls._price_field is None:
+            cls._price_field = ProductSerializer().fields['price']
+        return cls._price_field
+
+    def to_representation(self, row):
+        return {
+            'id': row['id'],
+            'name': row['name'],
+            'description': row['description'],
+            'price': self.get_price_field().to_representation(row['price']),
+        }
+
+
+class SimilarProductSerializer(ProductReadSerializer):
+    """
+    Строки product.similar.similar_products: товар и число пользователей,
+    у которых он в Избранном вместе с запрошенным.
+    """
+
+    def to_representation(self, row):
+        return dict(super().to_representation(row), score=row['score'])
+
+
+class PopularProductSerializer(ProductSerializer):
+    class Meta(ProductSerializer.Meta):
+        fields = ProductSerializer.Meta.fields + ("favorite_count",)
+        read_only_fields = ("favorite_count",)
+
+
+class ProductLookupSerializer(serializers.Serializer):
+    """
+    Список id для мульти-запроса товаров (?ids=1,5,9 или POST {"ids": [...]}).
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1, max_value=BigIntegerField.MAX_BIGINT),
+                                allow_empty=False)
+
+    def validate_ids(self, ids):
+        limit = settings.PRODUCT_LOOKUP_MAX_IDS
+        if len(ids) > limit:
+            raise serializers.ValidationError("Ensure this field has no more than %d elements." % limit)
+        # Повторы убираем, порядок первого вхождения сохраняем
+        return list(dict.fromkeys(ids))
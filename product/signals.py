@@ -0,0 +1,45 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import bump_catalog_version
+from .models import Product, ProductTombstone
+from .stats import record_price_changes
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog_cache(sender, **kwargs):
+    bump_catalog_version()
+    # Повторно после коммита: иначе параллельный запрос мог успеть
+    # закэшировать еще не закоммиченное состояние под новой версией
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_delete, sender=Product)
+def record_tombstone(sender, instance, **kwargs):
+    # Для ленты изменений: удаленная строка иначе не оставляет следа
+    ProductTombstone.objects.create(product_id=instance.pk)
+
+
+@receiver(pre_save, sender=Product)
+def remember_old_price(sender, instance, update_fields=None, **kwargs):
+    # Старая цена нужна сводке /products/stats/, берем ее из БД, а не из экземпляра:
+    # он мог быть загружен задолго до сохранения
+    if instance._state.adding or (update_fields is not None and 'price' not in update_fields):
+        return
+    instance._old_price = Product.objects.filter(pk=instance.pk).values_list('price', flat=True).first()
+
+
+@receiver(post_save, sender=Product)
+def update_price_stats(sender, instance, created, **kwargs):
+    old_price = instance.__dict__.pop('_old_price', None)
+    if created:
+        record_price_changes(added=[instance.price])
+    elif old_price is not None and old_price != instance.price:
+        record_price_changes(added=[instance.price], removed=[old_price])
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_price_stats(sender, instance, **kwargs):
+    record_price_changes(removed=[instance.price])
@@ -0,0 +1,159 @@
+# "С этим товаром также добавляли": счетчики пар товаров из Избранного
+# (ProductCooccurrence) и top-K соседей каждого товара (SimilarProduct).
+# Изменения Избранного правят только пары затронутых пользователей.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import Product, ProductCooccurrence, SimilarProduct
+from .serializers import ProductReadSerializer
+
+# Пачка товаров на один пересчет top-K (ограничение числа параметров SQLite)
+REFRESH_BATCH_SIZE = 500
+
+BUILD_SQL = (
+    'INSERT INTO {pairs} (product_id, other_id, count) '
+    'SELECT a.product_id, b.product_id, COUNT(*) FROM {favorites} a '
+    'JOIN {favorites} b ON b.user_id = a.user_id AND b.product_id != a.product_id '
+    'GROUP BY a.product_id, b.product_id'
+)
+
+# Пары пачки пользователей, где хотя бы один товар из изменившихся;
+# у каждого пользователя упорядоченная пара встречается ровно один раз
+ACCUMULATE_SQL = (
+    'INSERT INTO {pairs} (product_id, other_id, count) '
+    'SELECT a.product_id, b.product_id, %s * COUNT(*) FROM {favorites} a '
+    'JOIN {favorites} b ON b.user_id = a.user_id AND b.product_id != a.product_id '
+    'WHERE a.user_id IN ({users}){changed} '
+    'GROUP BY a.product_id, b.product_id '
+    'ON CONFLICT (product_id, other_id) DO UPDATE SET count = count + excluded.count'
+)
+
+# Соседи изменившихся товаров из Избранного пачки пользователей, чей top-K
+# мог поменяться: пара с изменившимся товаром уже в нем...
+PARTNERS_SQL = (
+    'SELECT DISTINCT p.product_id FROM {pairs} p '
+    'WHERE p.other_id IN ({ids}) AND p.product_id NOT IN ({ids}) '
+    'AND p.product_id IN (SELECT product_id FROM {favorites} WHERE user_id IN ({users})) '
+    'AND (EXISTS (SELECT 1 FROM {similar} s WHERE s.product_id = p.product_id AND s.similar_id = p.other_id)'
+    '{entering})'
+)
+
+# ... или после добавления она не хуже последней в top-K (неполный top-K - порог 0)
+ENTERING_SQL = (
+    ' OR p.count >= COALESCE((SELECT MIN(s.score) FROM {similar} s '
+    'WHERE s.product_id = p.product_id HAVING COUNT(*) >= %s), 0)'
+)
+
+RANK_SQL = (
+    'INSERT INTO {similar} (product_id, similar_id, score) '
+    'SELECT product_id, other_id, count FROM ('
+    'SELECT product_id, other_id, count, ROW_NUMBER() OVER '
+    '(PARTITION BY product_id ORDER BY count DESC, other_id) AS position '
+    'FROM {pairs} WHERE count > 0{products}) WHERE position <= %s'
+)
+
+
+def tables():
+    return {
+        'pairs': ProductCooccurrence._meta.db_table,
+        'similar': SimilarProduct._meta.db_table,
+        'favorites': get_user_model().favorites.through._meta.db_table,
+    }
+
+
+def placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def refresh_top_k(product_ids=None):
+    """
+    Пересобирает top-K соседей товаров из счетчиков пар (None - всех товаров).
+    Обнулившиеся после удалений пары этих товаров заодно удаляются.
+    """
+    names = tables()
+    top_k = settings.SIMILAR_PRODUCTS_TOP_K
+    with transaction.atomic(), connection.cursor() as cursor:
+        if product_ids is None:
+            cursor.execute('DELETE FROM {similar}'.format(**names))
+            cursor.execute(RANK_SQL.format(products='', **names), [top_k])
+            return
+        product_ids = sorted(product_ids)
+        for start in range(0, len(product_ids), REFRESH_BATCH_SIZE):
+            batch = product_ids[start:start + REFRESH_BATCH_SIZE]
+            where = ' WHERE product_id IN (%s)' % placeholders(batch)
+            cursor.execute('DELETE FROM {pairs}{where} AND count = 0'.format(where=where, **names), batch)
+            cursor.execute('DELETE FROM {similar}{where}'.format(where=where, **names), batch)
+            # Отрицательные счетчики (связи старше индекса) в top-K не попадают
+            cursor.execute(RANK_SQL.format(products=' AND product_id IN (%s)' % placeholders(batch), **names),
+                           batch + [top_k])
+
+
+def record_favorite_change(user_ids, product_ids, delta):
+    """
+    Учитывает добавление (delta=1, после вставки связей) или удаление
+    (delta=-1, до удаления связей) товаров product_ids из Избранного
+    пользователей user_ids; None - все их товары (очистка Избранного).
+    """
+    user_ids = sorted(user_ids)
+    if product_ids is not None:
+        product_ids = sorted(product_ids)
+        if not product_ids:
+            return
+    if not user_ids:
+        return
+    names = tables()
+    favorites = get_user_model().favorites.through
+    changed = ''
+    if product_ids is not None:
+        changed = ' AND (a.product_id IN ({ids}) OR b.product_id IN ({ids}))'.format(
+            ids=placeholders(product_ids))
+    with transaction.atomic(), connection.cursor() as cursor:
+        batches = [user_ids[start:start + REFRESH_BATCH_SIZE]
+                   for start in range(0, len(user_ids), REFRESH_BATCH_SIZE)]
+        for batch in batches:
+            cursor.execute(ACCUMULATE_SQL.format(users=placeholders(batch), changed=changed, **names),
+                           [delta] + batch + (product_ids + product_ids if product_ids is not None else []))
+        if product_ids is None:
+            # Очистка Избранного: изменились пары между всеми товарами пользователей
+            refresh_top_k(set(favorites.objects.filter(user_id__in=user_ids)
+                              .values_list('product_id', flat=True)))
+            return
+
+        refresh = set(product_ids)
+        entering = ENTERING_SQL.format(**names) if delta > 0 else ''
+        for batch in batches:
+            sql = PARTNERS_SQL.format(ids=placeholders(product_ids), users=placeholders(batch),
+                                      entering=entering, **names)
+            cursor.execute(sql, product_ids + product_ids + batch
+                           + ([settings.SIMILAR_PRODUCTS_TOP_K] if delta > 0 else []))
+            refresh.update(product_id for product_id, in cursor.fetchall())
+        refresh_top_k(refresh)
+        # Обнулившиеся пары соседей, чей top-K не пересчитывался
+        cursor.execute('DELETE FROM {pairs} WHERE other_id IN ({ids}) AND count = 0'.format(
+            ids=placeholders(product_ids), **names), product_ids)
+
+
+def rebuild_similar_products():
+    """
+    Полный пересчет индекса по таблице Избранного. Возвращает число пар.
+    """
+    names = tables()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('DELETE FROM {pairs}'.format(**names))
+        cursor.execute(BUILD_SQL.format(**names))
+        pairs = cursor.rowcount
+        refresh_top_k()
+    return pairs
+
+
+def similar_products(product_id):
+    """
+    Соседи товара по убыванию числа общих "лайков": строки ProductReadSerializer
+    с полем score, одним запросом по индексу similar_product_score_idx.
+    """
+    return list(Product.objects.filter(similar_to__product_id=product_id)
+                .annotate(score=F('similar_to__score'), similar_id=F('similar_to__similar_id'))
+                .order_by('-score', 'similar_id')
+                .values(*ProductReadSerializer.fields, 'score'))
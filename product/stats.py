@@ -0,0 +1,154 @@
+# Статистика цен для /products/stats/ из сводной таблицы PriceBucket: строка
+# на корзину PRODUCT_PRICE_BUCKETS. Записи в обход сигналов и импорта
+# исправляет команда verify_price_stats.
+from bisect import bisect_right
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from root.replicas import read_from_primary
+
+from .models import PriceBucket, Product
+from .serializers import ProductReadSerializer
+
+CENT = Decimal('0.01')
+
+
+def bucket_edges():
+    edges = [Decimal(str(edge)).quantize(CENT) for edge in settings.PRODUCT_PRICE_BUCKETS]
+    if not edges or any(left >= right for left, right in zip(edges, edges[1:])):
+        raise ImproperlyConfigured('PRODUCT_PRICE_BUCKETS must be a non-empty increasing sequence')
+    return edges
+
+
+def bucket_lower(edges, price):
+    # Цены ниже первой границы считаются в первой корзине
+    return edges[max(bisect_right(edges, price) - 1, 0)]
+
+
+def to_cents(price):
+    return int(Decimal(price).quantize(CENT) * 100)
+
+
+def bucket_range(edges, lower):
+    """
+    Фильтр товаров корзины: [lower, upper), у первой без нижней границы, у последней без верхней.
+    """
+    index = edges.index(lower)
+    filters = {}
+    if index:
+        filters['price__gte'] = lower
+    if index + 1 < len(edges):
+        filters['price__lt'] = edges[index + 1]
+    return filters
+
+
+def record_price_changes(added=(), removed=()):
+    """
+    Учитывает цены появившихся (added) и исчезнувших (removed) товаров.
+    Вызывается после записи в product_product: пересчет границы корзины
+    читает уже новое состояние каталога.
+    """
+    edges = bucket_edges()
+    changes = {}
+    for prices, sign in ((added, 1), (removed, -1)):
+        for price in prices:
+            price = Decimal(price).quantize(CENT)
+            change = changes.setdefault(bucket_lower(edges, price),
+                                        {'count': 0, 'cents': 0, 'added': [], 'removed': []})
+            change['count'] += sign
+            change['cents'] += sign * to_cents(price)
+            change['added' if sign > 0 else 'removed'].append(price)
+
+    with transaction.atomic():
+        for lower, change in changes.items():
+            updates = {'count': F('count') + change['count'], 'total_cents': F('total_cents') + change['cents']}
+            if change['added']:
+                low, high = min(change['added']), max(change['added'])
+                updates['min_price'] = Least(Coalesce('min_price', Value(low)), Value(low))
+                updates['max_price'] = Greatest(Coalesce('max_price', Value(high)), Value(high))
+            buckets = PriceBucket.objects.filter(lower=lower)
+            buckets.update(**updates)
+            if change['removed']:
+                refresh_bounds(edges, buckets, change['removed'])
+
+
+def refresh_bounds(edges, buckets, removed):
+    # Минимум/максимум ищем заново, только если удалили саму границу корзины
+    bounds = buckets.values('lower', 'min_price', 'max_price').first()
+    if bounds is None:
+        return
+    products = Product.objects.filter(**bucket_range(edges, bounds['lower']))
+    updates = {}
+    if bounds['min_price'] is not None and min(removed) <= bounds['min_price']:
+        updates['min_price'] = products.order_by('price').values_list('price', flat=True).first()
+    if bounds['max_price'] is not None and max(removed) >= bounds['max_price']:
+        updates['max_price'] = products.order_by('-price').values_list('price', flat=True).first()
+    if updates:
+        buckets.update(**updates)
+
+
+def compute_price_buckets():
+    """
+    Сводка, посчитанная заново по таблице товаров: агрегат на каждую корзину
+    по диапазону индекса цены, вместе - один проход по индексу.
+    """
+    edges = bucket_edges()
+    buckets = []
+    for index, lower in enumerate(edges):
+        row = Product.objects.filter(**bucket_range(edges, lower)).aggregate(
+            count=Count('id'), total=Sum('price'), min_price=Min('price'), max_price=Max('price'))
+        buckets.append(PriceBucket(
+            lower=lower,
+            upper=edges[index + 1] if index + 1 < len(edges) else None,
+            count=row['count'],
+            total_cents=to_cents(row['total'] or 0),
+            min_price=row['min_price'],
+            max_price=row['max_price'],
+        ))
+    return buckets
+
+
+def rebuild_price_stats():
+    buckets = compute_price_buckets()
+    with transaction.atomic():
+        PriceBucket.objects.all().delete()
+        PriceBucket.objects.bulk_create(buckets)
+    return buckets
+
+
+def read_price_stats():
+    """
+    Ответ /products/stats/. Если сводка не построена или границы корзин в
+    настройках поменялись, она один раз пересчитывается целиком.
+    """
+    buckets = list(PriceBucket.objects.all())
+    if [bucket.lower for bucket in buckets] != bucket_edges():
+        # Сводка пересчитывается в primary - и читать для нее нужно с primary
+        with read_from_primary():
+            buckets = rebuild_price_stats()
+
+    price = ProductReadSerializer.get_price_field()
+
+    def format_price(value):
+        return None if value is None else price.to_representation(value)
+
+    count = sum(bucket.count for bucket in buckets)
+    filled = [bucket for bucket in buckets if bucket.count > 0]
+    average = None
+    if count > 0:
+        average = (Decimal(sum(bucket.total_cents for bucket in buckets)) / count / 100).quantize(CENT)
+    return {
+        'count': count,
+        'min': format_price(filled[0].min_price) if filled else None,
+        'max': format_price(filled[-1].max_price) if filled else None,
+        'avg': format_price(average),
+        'buckets': [
+            {'min': format_price(bucket.lower), 'max': format_price(bucket.upper), 'count': bucket.count}
+            for bucket in buckets
+        ],
+    }
@@ -1,7 +1,21 @@
 from django.urls import path
-from .views import ProductListCreateView, ProductDetailView
+from .async_views import AsyncProductListView, AsyncProductDetailView
+from .views import (ProductListCreateView, ProductDetailView, ProductSearchView,
+                    ProductImportView, ProductExportView, ProductPopularView,
+                    ProductChangesView, ProductLookupView, ProductSimilarView,
+                    ProductStatsView)
 
 urlpatterns = [
     path('products/', ProductListCreateView.as_view(), name='product-list-create'),
+    path('products/changes/', ProductChangesView.as_view(), name='product-changes'),
+    path('products/export/', ProductExportView.as_view(), name='product-export'),
+    path('products/import/', ProductImportView.as_view(), name='product-import'),
+    path('products/lookup/', ProductLookupView.as_view(), name='product-lookup'),
+    path('products/popular/', ProductPopularView.as_view(), name='product-popular'),
+    path('products/search/', ProductSearchView.as_view(), name='product-search'),
+    path('products/stats/', ProductStatsView.as_view(), name='product-stats'),
     path('products/<int:pk>/', ProductDetailView.as_view(), name='product-detail'),
+    path('products/<int:pk>/similar/', ProductSimilarView.as_view(), name='product-similar'),
+    path('products/async/', AsyncProductListView.as_view(), name='product-list-async'),
+    path('products/<int:pk>/async/', AsyncProductDetailView.as_view(), name='product-detail-async'),
 ]
@@ -1,12 +1,73 @@
+from django.http import StreamingHttpResponse
 from rest_framework import generics
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from root.replicas import ReplicaReadMixin
+from .cache import CatalogCacheMixin
+from .changes import ChangeFeed
+from .export import CONTENT_TYPES, export_products
+from .filters import ProductFilter
+from .importer import READERS, ProductImporter, decode_lines
 from .models import Product
-from .serializers import ProductSerializer
+from .pagination import SearchPagination
+from .search import ProductSearch, build_match_query
+from .serializers import (ProductSerializer, ProductReadSerializer, PopularProductSerializer,
+                          ProductLookupSerializer, SimilarProductSerializer)
+from .similar import similar_products
+from .stats import read_price_stats
 
 
-class ProductListCreateView(generics.ListCreateAPIView):
-    queryset = Product.objects.all()
+class ProductReadMixin:
+    """
+    GET-запросы читают `.values()` и сериализуются ProductReadSerializer,
+    остальные методы работают с моделями и ProductSerializer.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method == 'GET':
+            return queryset.values(*ProductReadSerializer.fields)
+        return queryset
+
+    def get_serializer_class(self):
+        if self.request.method == 'GET':
+            return ProductReadSerializer
+        return super().get_serializer_class()
+
+
+class ProductLookupMixin:
+    """
+    Несколько товаров по списку id одним запросом `IN`: товары идут в порядке
+    запроса, не найденные id перечисляются в "missing".
+    """
+
+    def lookup(self, ids):
+        serializer = ProductLookupSerializer(data={'ids': ids})
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        rows = {row['id']: row for row in
+                Product.objects.filter(id__in=ids).values(*ProductReadSerializer.fields)}
+        return Response({
+            'results': ProductReadSerializer([rows[pk] for pk in ids if pk in rows], many=True).data,
+            'missing': [pk for pk in ids if pk not in rows],
+        })
+
+
+class ProductListCreateView(CatalogCacheMixin, ReplicaReadMixin, ProductReadMixin, ProductLookupMixin,
+                            generics.ListCreateAPIView):
+    # Порядок по первичному ключу нужен для keyset-пагинации
+    queryset = Product.objects.order_by('id')
     serializer_class = ProductSerializer
+    filter_backends = [ProductFilter]
+
+    def list(self, request, *args, **kwargs):
+        # ?ids=1,5,9 - вместо страницы каталога отдаем эти товары
+        ids = request.query_params.get('ids')
+        if ids is not None:
+            return self.lookup([part for part in ids.split(',') if part.strip()])
+        return super().list(request, *args, **kwargs)
 
     def get_permissions(self):
         # Открываем доступ только суперпользователю для создания товара
@@ -15,6 +76,132 @@ class ProductListCreateView(generics.ListCreateAPIView):
         return [AllowAny()]
 
 
-class ProductDetailView(generics.RetrieveAPIView):
+class ProductDetailView(CatalogCacheMixin, ReplicaReadMixin, ProductReadMixin, generics.RetrieveAPIView):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
+
+
+class ProductLookupView(ReplicaReadMixin, ProductLookupMixin, APIView):
+    # POST {"ids": [...]} для длинных списков, которые не помещаются в URL
+    replica_methods = ('POST',)
+
+    def post(self, request, *args, **kwargs):
+        return self.lookup(request.data.get('ids') if isinstance(request.data, dict) else None)
+
+
+class ProductPopularView(ReplicaReadMixin, generics.ListAPIView):
+    """
+    "Самые любимые" товары. Читается по индексу (favorite_count DESC, id)
+    без агрегации по Избранному.
+    """
+    queryset = Product.objects.order_by('-favorite_count', 'id')
+    serializer_class = PopularProductSerializer
+
+
+class ProductSimilarView(ReplicaReadMixin, APIView):
+    """
+    "С этим товаром также добавляли в Избранное": до SIMILAR_PRODUCTS_TOP_K
+    товаров из заранее посчитанного индекса (product.similar), без пагинации.
+    """
+
+    def get(self, request, pk, *args, **kwargs):
+        rows = similar_products(pk)
+        # Пустой список - либо нет соседей, либо нет товара: различаем только во втором случае
+        if not rows and not Product.objects.filter(pk=pk).exists():
+            raise NotFound()
+        return Response(SimilarProductSerializer(rows, many=True).data)
+
+
+class ProductStatsView(CatalogCacheMixin, ReplicaReadMixin, APIView):
+    """
+    Минимальная, максимальная и средняя цена каталога и гистограмма по
+    корзинам PRODUCT_PRICE_BUCKETS из сводной таблицы (product.stats).
+    """
+
+    def get(self, request, *args, **kwargs):
+        return Response(read_price_stats())
+
+
+class ProductChangesView(generics.GenericAPIView):
+    """
+    Изменения каталога после курсора: {"upserts", "deletions", "next", "has_more"}.
+    Читается с primary: курсор сдвигается к отметке времени primary, и строки,
+    до которых реплика еще не догнала, были бы пропущены навсегда.
+    """
+    max_limit = 1000
+
+    def get(self, request, *args, **kwargs):
+        limit = request.query_params.get('limit', 500)
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValidationError({'limit': 'A valid integer is required.'})
+        if not 0 < limit <= self.max_limit:
+            raise ValidationError({'limit': 'Must be between 1 and %d.' % self.max_limit})
+        return Response(ChangeFeed(request.query_params.get('since'), limit).read())
+
+
+class ProductSearchView(CatalogCacheMixin, ReplicaReadMixin, generics.ListAPIView):
+    serializer_class = ProductSerializer
+    pagination_class = SearchPagination
+
+    def get_queryset(self):
+        query = build_match_query(self.request.query_params.get('q'))
+        if not query:
+            raise ValidationError({'q': 'Search query is required.'})
+        return ProductSearch(query)
+
+
+class ProductImportView(APIView):
+    """
+    Массовая загрузка товаров потоком: тело запроса (text/csv или
+    application/x-ndjson) читается построчно, без загрузки целиком в память.
+    """
+    permission_classes = (IsAdminUser,)
+    content_formats = {
+        'text/csv': 'csv',
+        'application/x-ndjson': 'jsonl',
+        'application/jsonl': 'jsonl',
+    }
+    max_batch_size = 5000
+
+    def post(self, request, *args, **kwargs):
+        content_type = request.content_type.split(';')[0].strip()
+        input_format = self.content_formats.get(content_type)
+        if input_format is None:
+            raise ValidationError({'content_type': 'Expected one of: %s.' % ', '.join(self.content_formats)})
+        if request.stream is None:
+            raise ValidationError({'detail': 'Request body is empty.'})
+
+        try:
+            batch_size = int(request.query_params.get('batch_size', 1000))
+        except ValueError:
+            raise ValidationError({'batch_size': 'A valid integer is required.'})
+        if not 1 <= batch_size <= self.max_batch_size:
+            raise ValidationError({'batch_size': 'Must be between 1 and %s.' % self.max_batch_size})
+
+        try:
+            importer = ProductImporter(batch_size=batch_size,
+                                       upsert_key=request.query_params.get('upsert_key'))
+        except ValueError as exc:
+            raise ValidationError({'upsert_key': str(exc)})
+
+        report = importer.run(READERS[input_format](decode_lines(request.stream)))
+        return Response(report)
+
+
+class ProductExportView(APIView):
+    """
+    Выгрузка всего каталога потоком (?output=ndjson или ?output=json).
+    Память не зависит от размера каталога: строки читаются кусками
+    и сразу отдаются клиенту.
+    """
+    permission_classes = (AllowAny,)
+
+    def get(self, request, *args, **kwargs):
+        # Параметр format занят DRF под выбор рендерера, поэтому output
+        output_format = request.query_params.get('output', 'ndjson')
+        if output_format not in CONTENT_TYPES:
+            raise ValidationError({'output': 'Allowed values: %s.' % ', '.join(CONTENT_TYPES)})
+        return StreamingHttpResponse(export_products(output_format),
+                                     content_type=CONTENT_TYPES[output_format])
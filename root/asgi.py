@@ -3,6 +3,9 @@ ASGI config for root project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Native async views (e.g. ``login/async/``) only run without a worker thread
+per request when served through this application.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -0,0 +1,303 @@
+# Метрики запросов по представлениям в формате Prometheus. Каждый процесс
+# копит свои счетчики и сбрасывает снимок в METRICS_DIR/<pid>.json,
+# /metrics/ суммирует снимки всех воркеров.
+import atexit
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from rest_framework.permissions import BasePermission, IsAdminUser
+from rest_framework.views import APIView
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# имя: (тип, описание, границы корзин для гистограмм)
+METRICS = {
+    'http_requests_total': ('counter', 'Requests by view, method and status.', None),
+    'http_request_duration_seconds': ('histogram', 'Time to produce the response.', LATENCY_BUCKETS),
+    'http_response_size_bytes': ('histogram', 'Response body size (streaming responses excluded).',
+                                 SIZE_BUCKETS),
+    'http_db_queries': ('histogram', 'DB queries issued per request.', QUERY_BUCKETS),
+    'http_db_query_duration_seconds_total': ('counter', 'Time spent in DB queries.', None),
+}
+
+# Метрики, которые не накапливаются, а показывают текущее состояние:
+# берутся только из снимков живых процессов
+GAUGE = 'gauge'
+
+_request_stats = ContextVar('request_stats', default=None)
+
+
+def register_metric(name, kind, help_text, buckets=None):
+    METRICS[name] = (kind, help_text, buckets)
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._collectors = []
+        self._flushed = 0.0
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+
+    def register_collector(self, collector):
+        """
+        collector() возвращает [(имя, labels, значение)] для метрик,
+        которые уже считаются где-то еще (кэш токенов, пул хэширования).
+        """
+        self._collectors.append(collector)
+
+    def inc(self, name, labels, value=1):
+        key = (name, label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, label_key(labels))
+        with self._lock:
+            state = self.histograms.get(key)
+            if state is None:
+                # счетчики по корзинам (не накопительные), сумма, количество
+                state = self.histograms[key] = [0] * len(buckets) + [0, 0]
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    state[index] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counters = [[name, dict(labels), value] for (name, labels), value in self.counters.items()]
+            histograms = [[name, dict(labels), list(state)]
+                          for (name, labels), state in self.histograms.items()]
+        for collector in self._collectors:
+            counters.extend([name, labels, value] for name, labels, value in collector())
+        return {'pid': os.getpid(), 'counters': counters, 'histograms': histograms}
+
+    def flush(self, force=False):
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._flushed < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self._flushed = now
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, '%s.json' % os.getpid())
+        # Пишем во временный файл и атомарно подменяем: читатель не увидит половину снимка
+        temp_path = '%s.tmp' % path
+        with open(temp_path, 'w') as output:
+            json.dump(self.snapshot(), output)
+        os.replace(temp_path, path)
+
+    def collect(self):
+        """
+        Снимки всех процессов из METRICS_DIR (включая текущий), сложенные вместе.
+        """
+        directory = settings.METRICS_DIR
+        if not directory:
+            return merge_snapshots([self.snapshot()])
+        self.flush(force=True)
+        snapshots = []
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as source:
+                    snapshots.append(json.load(source))
+            except (OSError, ValueError):
+                continue
+        return merge_snapshots(snapshots)
+
+
+def is_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def merge_snapshots(snapshots):
+    counters = {}
+    histograms = {}
+    for snapshot in snapshots:
+        alive = None
+        for name, labels, value in snapshot['counters']:
+            if METRICS.get(name, (GAUGE,))[0] == GAUGE:
+                if alive is None:
+                    alive = is_alive(snapshot['pid'])
+                if not alive:
+                    continue
+            key = (name, label_key(labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, state in snapshot['histograms']:
+            key = (name, label_key(labels))
+            merged = histograms.get(key)
+            if merged is None:
+                histograms[key] = list(state)
+            else:
+                histograms[key] = [left + right for left, right in zip(merged, state)]
+    return counters, histograms
+
+
+def format_labels(labels, **extra):
+    pairs = list(labels) + sorted(extra.items())
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in pairs)
+    return '{%s}' % ','.join('%s="%s"' % (name, value) for (name, _), value in zip(pairs, escaped))
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(counters, histograms):
+    lines = []
+    for name in sorted(METRICS):
+        kind, help_text, buckets = METRICS[name]
+        if kind == 'histogram':
+            series = sorted((labels, state) for (metric, labels), state in histograms.items()
+                            if metric == name)
+        else:
+            series = sorted((labels, value) for (metric, labels), value in counters.items()
+                            if metric == name)
+        if not series:
+            continue
+        lines.append('# HELP %s %s' % (name, help_text))
+        lines.append('# TYPE %s %s' % (name, kind))
+        for labels, value in series:
+            if kind != 'histogram':
+                lines.append('%s%s %s' % (name, format_labels(labels), format_value(value)))
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, value):
+                cumulative += count
+                lines.append('%s_bucket%s %s' % (name, format_labels(labels, le=bound), cumulative))
+            lines.append('%s_bucket%s %s' % (name, format_labels(labels, le='+Inf'), value[-1]))
+            lines.append('%s_sum%s %s' % (name, format_labels(labels), format_value(value[-2])))
+            lines.append('%s_count%s %s' % (name, format_labels(labels), value[-1]))
+    return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+atexit.register(registry.flush, force=True)
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats['queries'] += 1
+        stats['query_time'] += time.perf_counter() - started
+
+
+def install_query_recorder(connection, **kwargs):
+    # Обертка ставится один раз на соединение и ничего не делает вне запроса;
+    # контекст запроса доходит и до потоков sync_to_async у async-представлений
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder)
+
+
+class MetricsMiddleware:
+    """
+    Должен стоять первым в MIDDLEWARE, чтобы время включало всю цепочку.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        for connection in connections.all():
+            install_query_recorder(connection)
+        stats, token = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        self.finish(request, response, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats, token = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        self.finish(request, response, stats)
+        return response
+
+    def start(self):
+        stats = {'started': time.perf_counter(), 'queries': 0, 'query_time': 0.0}
+        return stats, _request_stats.set(stats)
+
+    def finish(self, request, response, stats):
+        match = request.resolver_match
+        view = match.url_name if match is not None and match.url_name else 'unmatched'
+        labels = {'view': view}
+        registry.inc('http_requests_total', dict(labels, method=request.method, status=str(response.status_code)))
+        registry.observe('http_request_duration_seconds', labels, time.perf_counter() - stats['started'])
+        registry.observe('http_db_queries', labels, stats['queries'])
+        registry.inc('http_db_query_duration_seconds_total', labels, stats['query_time'])
+        if not response.streaming:
+            registry.observe('http_response_size_bytes', labels, len(response.content))
+        registry.flush()
+
+
+class IsMetricsScraper(BasePermission):
+    """
+    Адрес клиента из METRICS_ALLOWED_IPS (Prometheus). Берется REMOTE_ADDR,
+    а не X-Forwarded-For, который клиент может подставить сам.
+    """
+
+    def has_permission(self, request, view):
+        return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+
+
+class MetricsView(APIView):
+    # Счетчики по представлениям и аутентификации: Prometheus или администратор
+    permission_classes = (IsMetricsScraper | IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(render(*registry.collect()), content_type=CONTENT_TYPE)
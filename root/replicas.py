@@ -0,0 +1,102 @@
+# Чтения каталога и Избранного безопасными методами идут на реплику, все
+# остальное - на default. После изменения Избранного пользователь на
+# REPLICA_PIN_SECONDS закрепляется за primary (отметка в общем кэше).
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+
+_read_alias = ContextVar('read_alias', default=None)
+
+# Аутентификация и токены всегда читаются с primary
+PRIMARY_ONLY_APPS = {'admin', 'auth', 'authtoken', 'contenttypes', 'sessions'}
+
+
+def pin_key(user_id):
+    return 'db-pin:%s' % user_id
+
+
+def pin_cache():
+    return caches[settings.REPLICA_PIN_CACHE_ALIAS]
+
+
+def pin_to_primary(user_id):
+    pin_cache().set(pin_key(user_id), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    return user_id is not None and pin_cache().get(pin_key(user_id)) is not None
+
+
+def choose_replica(user_id=None):
+    replicas = settings.DATABASE_REPLICAS
+    if not replicas or is_pinned(user_id):
+        return None
+    return random.choice(replicas)
+
+
+@contextmanager
+def read_from_replica(user_id=None):
+    token = _read_alias.set(choose_replica(user_id))
+    try:
+        yield _read_alias.get()
+    finally:
+        _read_alias.reset(token)
+
+
+@contextmanager
+def read_from_primary():
+    # Для чтений, результат которых записывается обратно в primary
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None:
+            return None
+        if model._meta.app_label in PRIMARY_ONLY_APPS or model._meta.label == settings.AUTH_USER_MODEL:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики - копии primary, связи между объектами из разных алиасов допустимы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
+
+
+class ReplicaReadMixin:
+    """
+    Для DRF-представлений: после аутентификации (она идет на primary)
+    чтения безопасных запросов направляются на реплику.
+    """
+    # Методы, которые только читают; POST-поиск может добавить себя сюда
+    replica_methods = SAFE_METHODS
+
+    def reads_from_replica(self, request):
+        return request.method in self.replica_methods
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.reads_from_replica(request):
+            self._read_alias_token = _read_alias.set(choose_replica(request.user.pk))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_read_alias_token', None)
+        if token is not None:
+            _read_alias.reset(token)
+            self._read_alias_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
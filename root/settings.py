@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'root.metrics.MetricsMiddleware',  # Первым: время и запросы к БД по всей цепочке
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -84,6 +87,54 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения, пути к SQLite-файлам через запятую:
+# DATABASE_REPLICA_PATHS=replica1.sqlite3,replica2.sqlite3
+# Локально реплику можно обновить командой `manage.py sync_replicas`
+DATABASE_REPLICAS = []
+for number, path in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_PATHS', '').split(',')), start=1):
+    alias = 'replica%d' % number
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path.strip(),
+        # В тестах реплика смотрит в ту же тестовую БД
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['root.replicas.ReplicaRouter']
+
+# Сколько секунд после изменения Избранного пользователь читает с primary;
+# отметка хранится в общем кэше, чтобы следующий запрос в другой воркер ее видел
+REPLICA_PIN_SECONDS = 5
+REPLICA_PIN_CACHE_ALIAS = 'shared'
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# default - кэш процесса; все, что должны видеть другие воркеры, лежит в shared
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Общий для всех воркеров хоста: сброс токенов, закрепление за primary и
+    # версия каталога должны быть видны в любом процессе. На нескольких хостах замените
+    # на Redis/Memcached
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('SHARED_CACHE_DIR',
+                                   os.path.join(tempfile.gettempdir(), 'clothing-store-cache')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Кэш отрендеренных ответов каталога (product.cache): ответы - в кэше процесса,
+# версия каталога - в общем, чтобы изменение в любом воркере или в команде
+# manage.py сразу делало старые ответы невидимыми
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_VERSION_CACHE_ALIAS = 'shared'
+CATALOG_CACHE_TIMEOUT = 60 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -128,7 +179,73 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',  # Используем токены для аутентификации
+        'user.authentication.CachedTokenAuthentication',  # Используем токены для аутентификации
+        'user.authentication.SignedTokenAuthentication',  # и подписанные Bearer-токены (login mode=signed)
     ],
+    # Keyset-пагинация без OFFSET и COUNT(*), размер страницы меняется через ?page_size=
+    'DEFAULT_PAGINATION_CLASS': 'product.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+    # Число доверенных прокси перед приложением: адрес клиента для ограничения
+    # частоты берется из X-Forwarded-For только за ними, иначе - REMOTE_ADDR.
+    # Без прокси X-Forwarded-For подставляет сам клиент
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
 }
 AUTH_USER_MODEL = "user.User"
+
+# Кэш токенов (user.authentication.CachedTokenAuthentication) в общем кэше:
+# выход и деактивация действуют во всех воркерах сразу, изменения в обход
+# сигналов (QuerySet.update) - не позже чем через AUTH_TOKEN_CACHE_TTL
+AUTH_TOKEN_CACHE_ALIAS = 'shared'
+AUTH_TOKEN_CACHE_TTL = 5 * 60
+
+# Время жизни подписанных токенов доступа (POST /login/ с "mode": "signed")
+SIGNED_TOKEN_MAX_AGE = 15 * 60
+
+# Пул для проверки паролей в асинхронном логине (user.hashing):
+# "process" - отдельные процессы в обход GIL, "thread" - потоки
+LOGIN_HASH_EXECUTOR = 'process'
+LOGIN_HASH_WORKERS = None  # None - по числу ядер
+LOGIN_HASH_MAX_QUEUE = 64
+
+# Максимум id в одном мульти-запросе товаров (?ids= и POST /products/lookup/)
+PRODUCT_LOOKUP_MAX_IDS = 200
+
+# Лента изменений каталога /products/changes/ (product.changes): изменения
+# моложе PRODUCT_CHANGES_LAG секунд отдаются со следующей синхронизацией,
+# следы удалений хранятся PRODUCT_TOMBSTONE_RETENTION_DAYS дней
+# (prune_product_tombstones), более старый курсор получает 410
+PRODUCT_CHANGES_LAG = 2
+PRODUCT_TOMBSTONE_RETENTION_DAYS = 30
+
+# Сколько соседей хранится для /products/<pk>/similar/ (product.similar);
+# после изменения настройки нужен rebuild_similar_products
+SIMILAR_PRODUCTS_TOP_K = 20
+
+# Нижние границы корзин гистограммы цен /products/stats/ (product.stats):
+# [0, 500), [500, 1000), ..., [10000, +inf). Сводка перестраивается сама
+# при первом запросе после изменения границ
+PRODUCT_PRICE_BUCKETS = (0, 500, 1000, 2500, 5000, 10000)
+
+# Ограничение частоты входа и регистрации (user.throttling): "N/период" -
+# ведро на N попыток, пополняемое на N за период, отдельно по IP и по email;
+# None отключает ограничение. Ведра хранятся в SQLite-файле, общем для всех
+# воркеров хоста. AUTH_THROTTLE_DISABLED=1 отключает все (нагрузочные тесты)
+AUTH_THROTTLE_PATH = os.environ.get('AUTH_THROTTLE_PATH',
+                                    os.path.join(tempfile.gettempdir(), 'clothing-store-throttle.sqlite3'))
+AUTH_THROTTLE_RATES = {
+    'login_ip': '30/min',
+    'login_email': '10/min',
+    'register_ip': '10/hour',
+    'register_email': '5/hour',
+}
+if os.environ.get('AUTH_THROTTLE_DISABLED'):
+    AUTH_THROTTLE_RATES = dict.fromkeys(AUTH_THROTTLE_RATES)
+
+# Метрики по представлениям (root.metrics), отдаются на /metrics/.
+# При нескольких воркерах (gunicorn и т.п.) задайте общий для них METRICS_DIR
+# и очищайте его при перезапуске сервера
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 1.0  # секунды между записями снимка процесса
+# Адреса, с которых /metrics/ отдается без аутентификации (Prometheus), через запятую;
+# остальным нужен токен администратора
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if ip.strip()]
@@ -0,0 +1,37 @@
+"""
+API-only deployment profile:
+
+    DJANGO_SETTINGS_MODULE=root.settings_api gunicorn root.wsgi
+
+The token-auth API does not use the admin, sessions, messages, static files
+or templates, so they are not installed and their middleware does not run on
+every request. Only JSON is rendered (the browsable API needs templates and
+static files). ``python -m benchmarks.profiles`` compares the startup and
+per-request cost of this profile with ``root.settings``.
+"""
+from root.settings import *  # noqa: F401,F403
+from root.settings import REST_FRAMEWORK
+
+INSTALLED_APPS = [
+    'django.contrib.auth',  # модель пользователя, права, AnonymousUser
+    'django.contrib.contenttypes',  # нужен django.contrib.auth
+    'rest_framework',
+    'rest_framework.authtoken',
+    'product',
+    'user',
+]
+
+MIDDLEWARE = [
+    'root.metrics.MetricsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+ROOT_URLCONF = 'root.urls_api'
+
+TEMPLATES = []
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+}
@@ -0,0 +1,24 @@
+"""
+Settings for the test suite (pytest.ini): project settings with cheap
+password hashing. Run the suite on all cores with ``pytest -n auto``;
+every xdist worker gets its own in-memory SQLite test database.
+"""
+from root.settings import *  # noqa: F401,F403
+
+# MD5 вместо PBKDF2: create_user в фикстурах не тратит по сотне миллисекунд.
+# pbkdf2_sha1 оставлен, чтобы проверять обновление устаревших хэшей
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
+# Потоки вместо процессов: spawn каждого воркера заново поднимает Django
+LOGIN_HASH_EXECUTOR = 'thread'
+LOGIN_HASH_WORKERS = 2
+
+# Ведра ограничения частоты conftest переносит во временный каталог pytest
+# (у каждого xdist-воркера свой)
+
+# Общий кэш - в памяти: у каждого xdist-воркера свой, и conftest очищает его перед тестом
+CACHES = dict(CACHES, shared={'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',  # noqa: F405
+                              'LOCATION': 'shared'})
@@ -0,0 +1,12 @@
+"""
+URLs of the API itself, without the admin. Used directly by the API-only
+profile (root.settings_api) and included by root.urls.
+"""
+from django.urls import path, include
+from .metrics import MetricsView
+
+urlpatterns = [
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('', include('user.urls')),
+    path('', include('product.urls')),
+]
@@ -1,8 +1,51 @@
 import pytest
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.test.utils import override_settings
 from product.models import Product
 from rest_framework.test import APIClient
 from rest_framework.authtoken.models import Token
+from root.metrics import registry
+from user.authentication import token_cache
+from user.throttling import throttle_store
+
+
+@pytest.fixture(scope='session', autouse=True)
+def throttle_path(tmp_path_factory):
+    # Файл ведер - во временном каталоге pytest, который pytest сам и удаляет
+    with override_settings(AUTH_THROTTLE_PATH=str(tmp_path_factory.mktemp('throttle') / 'buckets.sqlite3')):
+        yield
+
+
+# Кэши и ведра ограничения частоты живут вне тестовой БД и переживают откат
+# транзакции после теста, поэтому очищаем их перед каждым тестом
+@pytest.fixture(autouse=True)
+def clear_caches():
+    for cache in caches.all():
+        cache.clear()
+    token_cache.clear()
+    registry.reset()
+    throttle_store.reset()
+
+
+# Каталог побольше создается один раз на модуль и откатывается после него:
+# тесты модуля работают с ним внутри своих вложенных транзакций (savepoint),
+# поэтому их изменения тоже откатываются. Модуль, где он используется,
+# не должен рассчитывать на пустую таблицу товаров
+SEEDED_CATALOG_SIZE = 1000
+
+
+@pytest.fixture(scope='module')
+def seeded_catalog(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        with transaction.atomic():
+            Product.objects.bulk_create([
+                Product(name="item%d" % i, description="seeded item", price=100 + i % 500)
+                for i in range(SEEDED_CATALOG_SIZE)
+            ])
+            yield list(Product.objects.order_by('id'))
+            transaction.set_rollback(True)
 
 
 # Для создания нескольких товаров, а именно в кол-ве двух
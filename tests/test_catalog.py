@@ -0,0 +1,61 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from constants import API
+from product.models import Product
+from rest_framework import status
+from tests.conftest import api_client, create_user, seeded_catalog, SEEDED_CATALOG_SIZE
+
+# Все тесты модуля работают с общим каталогом из seeded_catalog
+pytestmark = pytest.mark.django_db
+
+
+def walk(api_client, params):
+    ids = []
+    response = api_client.get(API.PRODUCT_URL, params)
+    while True:
+        assert response.status_code == status.HTTP_200_OK
+        ids.extend(product['id'] for product in response.data['results'])
+        if response.data['next'] is None:
+            return ids, response
+        response = api_client.get(response.data['next'])
+
+
+def test_keyset_pages_cover_catalog(api_client, seeded_catalog):
+    ids, _ = walk(api_client, {'page_size': 50})
+    assert ids == [product.id for product in seeded_catalog]
+
+
+def test_keyset_pages_by_price(api_client, seeded_catalog):
+    ids, _ = walk(api_client, {'page_size': 100, 'ordering': '-price', 'min_price': 300})
+    expected = sorted((product for product in seeded_catalog if product.price >= 300),
+                      key=lambda product: (product.price, product.id), reverse=True)
+    assert ids == [product.id for product in expected]
+
+
+def test_favorite_batch_view_constant_queries(api_client, create_user, seeded_catalog):
+    api_client.force_authenticate(user=create_user)
+    ids = [product.id for product in seeded_catalog[:200]]
+
+    create_user.favorites.add(*ids[:60])
+
+    # Число запросов не зависит от размера пачки
+    with CaptureQueriesContext(connection) as small:
+        api_client.post(reverse('user-favorite-batch'), {"add": ids[60:62], "remove": ids[:1]}, format="json")
+    with CaptureQueriesContext(connection) as large:
+        api_client.post(reverse('user-favorite-batch'), {"add": ids[62:], "remove": ids[1:60]}, format="json")
+    assert len(large) == len(small)
+    assert create_user.favorites.count() == 140
+
+
+def test_seeded_catalog_delete(seeded_catalog):
+    # Удаление откатывается вместе с транзакцией теста, проверка - в следующем тесте
+    Product.objects.filter(id=seeded_catalog[0].id).delete()
+    assert Product.objects.count() == SEEDED_CATALOG_SIZE - 1
+
+
+def test_seeded_catalog_is_restored(seeded_catalog):
+    # Изменения предыдущих тестов откатились вместе с их транзакциями
+    assert Product.objects.filter(id=seeded_catalog[0].id).exists()
+    assert Product.objects.count() == SEEDED_CATALOG_SIZE
@@ -1,10 +1,29 @@
+import base64
+import datetime
+import json
+import os
+import subprocess
+import sys
+from io import StringIO
+
 import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from constants import API, ErrorMessages
-from product.models import Product
+from product.cache import VERSION_KEY, bump_catalog_version, get_version_cache
+from product.changes import encode_cursor
+from product.importer import ProductImporter
+from product.models import PriceBucket, Product, ProductCooccurrence, ProductTombstone, SimilarProduct
+from product.stats import compute_price_buckets
+from product.serializers import ProductSerializer, ProductReadSerializer
 from tests.conftest import api_client, create_products, create_product
 from tests.conftest import create_superuser
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 from rest_framework.authtoken.models import Token
 
@@ -21,7 +40,41 @@ def test_get_product_list_view(api_client, create_products):
 
     response = api_client.get(url)
     assert response.status_code == status.HTTP_200_OK, ErrorMessages.WRONG_STATUS_CODE
-    assert len(response.data) == 2
+    assert len(response.data['results']) == 2
+
+
+@pytest.mark.django_db
+def test_get_product_list_view_keyset_pages(api_client, create_products, create_product,
+                                            django_assert_num_queries):
+    # Проходим весь каталог страницами по одному товару
+    url = API.PRODUCT_URL + '?page_size=1'
+    seen = []
+    while url:
+        # Одна страница - один запрос, без COUNT(*)
+        with django_assert_num_queries(1):
+            response = api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['results']) == 1
+        seen.append(response.data['results'][0]['id'])
+        last = response.data
+        url = response.data['next']
+
+    assert seen == sorted(Product.objects.values_list('id', flat=True))
+
+    # Ссылка previous возвращает на предыдущую страницу
+    response = api_client.get(last['previous'])
+    assert [item['id'] for item in response.data['results']] == [seen[-2]]
+
+
+@pytest.mark.django_db
+def test_get_product_list_view_invalid_cursor(api_client, create_products):
+    response = api_client.get(API.PRODUCT_URL + '?cursor=not-a-cursor')
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    # Число вне 64-битного диапазона - тоже неверный курсор, а не 500
+    cursor = base64.urlsafe_b64encode(json.dumps({'p': [10 ** 30]}).encode()).decode()
+    response = api_client.get(API.PRODUCT_URL, {'cursor': cursor})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
 
 
 @pytest.mark.django_db
@@ -108,3 +161,681 @@ def test_create_product_view_anonymous_user():
 
     # Проверяем, что код ответа равен 401 (или другой ожидаемый код)
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+def test_get_product_list_view_cached_etag(api_client, create_products, django_assert_num_queries):
+    response = api_client.get(API.PRODUCT_URL)
+    assert response.status_code == status.HTTP_200_OK
+    etag = response['ETag']
+
+    # Повторный запрос отдается из кэша без обращения к БД
+    with django_assert_num_queries(0):
+        cached = api_client.get(API.PRODUCT_URL)
+    assert cached.content == response.content
+    assert cached['ETag'] == etag
+
+    # Клиент с актуальной версией получает 304 без тела
+    with django_assert_num_queries(0):
+        response = api_client.get(API.PRODUCT_URL, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b''
+
+
+@pytest.mark.django_db
+def test_get_product_list_view_cache_checks_token(api_client, create_products, create_user):
+    assert api_client.get(API.PRODUCT_URL).status_code == status.HTTP_200_OK
+
+    # Закэшированный ответ не отдается с неверным токеном
+    response = api_client.get(API.PRODUCT_URL, HTTP_AUTHORIZATION='Token invalid')
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    token = Token.objects.create(user=create_user)
+    response = api_client.get(API.PRODUCT_URL, HTTP_AUTHORIZATION='Token ' + token.key)
+    assert response.status_code == status.HTTP_200_OK
+    assert 'ETag' in response
+
+
+@pytest.mark.django_db
+def test_get_product_view_cache_invalidated_on_change(api_client, create_product):
+    url = reverse('product-detail', kwargs={'pk': create_product.pk})
+    etag = api_client.get(url)['ETag']
+
+    # Изменение товара меняет версию каталога, старый ETag больше не подходит
+    create_product.price = 999
+    create_product.save()
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert response['ETag'] != etag
+    assert response.json()['price'] == '999.00'
+
+
+@pytest.mark.django_db
+def test_search_product_view(api_client, create_products, create_product):
+    # "jacket" есть в названии одного товара и в описании другого
+    Product.objects.create(name="coat", description="Warmer than any jacket", price=990)
+    url = reverse('product-search')
+
+    response = api_client.get(url, {'q': 'jacket'})
+    assert response.status_code == status.HTTP_200_OK
+    # Совпадение в названии ранжируется выше совпадения в описании
+    assert [item['name'] for item in response.data['results']] == ["jacket", "coat"]
+
+    # Курсорная пагинация по результатам поиска
+    response = api_client.get(url, {'q': 'jacket', 'page_size': 1})
+    assert [item['name'] for item in response.data['results']] == ["jacket"]
+    response = api_client.get(response.data['next'])
+    assert [item['name'] for item in response.data['results']] == ["coat"]
+    assert response.data['next'] is None
+
+    # Поиск по префиксу последнего слова
+    response = api_client.get(url, {'q': 'jea'})
+    assert [item['name'] for item in response.data['results']] == ["jeans"]
+
+
+@pytest.mark.django_db
+def test_search_product_view_index_in_sync(api_client, create_product):
+    url = reverse('product-search')
+    create_product.name = "chinos"
+    create_product.description = "Classic cotton chinos"
+    create_product.save()
+
+    assert api_client.get(url, {'q': 'chinos'}).data['results'][0]['id'] == create_product.id
+    assert api_client.get(url, {'q': 'jeans'}).data['results'] == []
+
+    create_product.delete()
+    assert api_client.get(url, {'q': 'chinos'}).data['results'] == []
+
+
+@pytest.mark.django_db
+def test_search_product_view_empty_query(api_client):
+    response = api_client.get(reverse('product-search'), {'q': '  "*" '})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_get_product_list_view_price_filter_and_ordering(api_client, create_products, create_product):
+    response = api_client.get(API.PRODUCT_URL, {'min_price': 600, 'ordering': '-price'})
+    assert response.status_code == status.HTTP_200_OK
+    assert [item['name'] for item in response.data['results']] == ["jeans", "jacket"]
+
+    response = api_client.get(API.PRODUCT_URL, {'max_price': 1000, 'ordering': 'name'})
+    assert [item['name'] for item in response.data['results']] == ["T-shirt", "jacket"]
+
+    # Keyset-пагинация продолжает работать поверх сортировки по цене
+    response = api_client.get(API.PRODUCT_URL, {'ordering': 'price', 'page_size': 2})
+    assert [item['name'] for item in response.data['results']] == ["T-shirt", "jacket"]
+    response = api_client.get(response.data['next'])
+    assert [item['name'] for item in response.data['results']] == ["jeans"]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [{'ordering': 'fast'}, {'min_price': 'cheap'}])
+def test_get_product_list_view_wrong_filter(api_client, params):
+    response = api_client.get(API.PRODUCT_URL, params)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params, index', [
+    ({'min_price': 100, 'max_price': 800, 'ordering': 'price'}, 'product_price_id_idx'),
+    ({'ordering': '-price'}, 'product_price_id_idx'),
+    ({'ordering': 'name'}, 'product_name_id_idx'),
+])
+def test_get_product_list_view_uses_index(api_client, create_products, params, index):
+    # Берем реальные запросы страницы (первой и следующей по курсору)
+    # и проверяем их план выполнения
+    with CaptureQueriesContext(connection) as first_page:
+        response = api_client.get(API.PRODUCT_URL, {**params, 'page_size': 1})
+    with CaptureQueriesContext(connection) as next_page:
+        api_client.get(response.data['next'])
+
+    for sql in (first_page.captured_queries[-1]['sql'], next_page.captured_queries[-1]['sql']):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        assert index in plan
+        # Индекс отдает строки уже в нужном порядке, отдельной сортировки нет
+        assert 'TEMP B-TREE' not in plan
+
+
+@pytest.mark.django_db
+def test_import_products_command(tmp_path):
+    path = tmp_path / "catalog.csv"
+    path.write_text(
+        "name,description,price\n"
+        "scarf,Wool scarf,150\n"
+        "sc@rf,Bad name,150\n"
+        "gloves,Leather gloves,-5\n"
+        "boots,\"Winter boots,\nwaterproof\",2100\n",
+        encoding="utf-8",
+    )
+    # Неверный UTF-8 в одной строке - ошибка этой строки
+    with open(path, "ab") as output:
+        output.write(b"hat,Wool \xff hat,90\n")
+
+    errors = StringIO()
+    call_command("import_products", str(path), "--batch-size", "1", stdout=StringIO(), stderr=errors)
+
+    # Ошибочные строки не прерывают загрузку остальных
+    assert "Row is not valid UTF-8." in errors.getvalue()
+    assert list(Product.objects.order_by("id").values_list("name", flat=True)) == ["scarf", "boots"]
+    assert Product.objects.get(name="boots").description == "Winter boots,\nwaterproof"
+
+
+@pytest.mark.django_db
+def test_import_products_view_upsert(api_client, create_superuser, create_product):
+    api_client.force_authenticate(user=create_superuser)
+    body = "\n".join([
+        '{"name": "jeans", "description": "Slim fit", "price": "999.90"}',
+        '{"name": "belt", "description": "Leather belt", "price": 300}',
+        '{"name": "cap", "description": "Cap"',
+        '{"name": "", "description": "No name", "price": 10}',
+    ]).encode() + b'\n{"name": "sock\xc3", "description": "Sock", "price": 10}'
+    response = api_client.post(reverse('product-import') + '?upsert_key=name', body,
+                               content_type='application/x-ndjson')
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['created'] == 1
+    assert response.data['updated'] == 1
+    assert [error['row'] for error in response.data['errors']] == [3, 4, 5]
+
+    create_product.refresh_from_db()
+    assert create_product.description == "Slim fit"
+    assert str(create_product.price) == "999.90"
+    assert Product.objects.filter(name="belt").exists()
+
+
+@pytest.mark.django_db
+def test_import_products_view_not_admin(api_client):
+    response = api_client.post(reverse('product-import'), 'name,description,price\n',
+                               content_type='text/csv')
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('output', ['ndjson', 'json'])
+def test_export_products_view(api_client, create_products, create_product, output):
+    response = api_client.get(reverse('product-export'), {'output': output})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.streaming
+
+    content = b''.join(response.streaming_content).decode()
+    if output == 'ndjson':
+        exported = [json.loads(line) for line in content.splitlines()]
+    else:
+        exported = json.loads(content)
+
+    # Выгрузка совпадает с тем, что отдает ProductSerializer
+    expected = ProductSerializer(Product.objects.order_by('id'), many=True).data
+    assert exported == json.loads(json.dumps(expected))
+
+
+@pytest.mark.django_db
+def test_export_products_command(tmp_path, create_products):
+    path = tmp_path / "catalog.json"
+    call_command("export_products", "--format", "json", "--chunk-size", "1", "-o", str(path))
+    assert [item['name'] for item in json.loads(path.read_text(encoding="utf-8"))] == ["T-shirt", "jacket"]
+
+
+@pytest.mark.django_db
+def test_popular_product_view(api_client, create_products, create_product):
+    tshirt, jacket = create_products
+    users = [get_user_model().objects.create_user(username="user%d" % i, email="user%d@gmail.com" % i,
+                                                  password=None) for i in range(3)]
+    for user in users:
+        user.favorites.add(jacket)
+    users[0].favorites.add(create_product)
+    # Повторное добавление и удаление отсутствующего не меняют счетчик
+    users[0].favorites.add(jacket)
+    users[1].favorites.remove(tshirt)
+    tshirt.user_set.add(users[2])
+    users[2].favorites.remove(jacket)
+
+    response = api_client.get(reverse('product-popular'))
+    assert response.status_code == status.HTTP_200_OK
+    assert [(item['name'], item['favorite_count']) for item in response.data['results']] == [
+        ("jacket", 2), ("T-shirt", 1), ("jeans", 1),
+    ]
+
+    users[0].favorites.clear()
+    jacket.refresh_from_db()
+    create_product.refresh_from_db()
+    assert (jacket.favorite_count, create_product.favorite_count) == (1, 0)
+
+
+@pytest.mark.django_db
+def test_reconcile_favorite_counts_command(create_products, create_user):
+    tshirt, jacket = create_products
+    create_user.favorites.add(tshirt, jacket)
+    # Портим счетчики, как если бы они разъехались
+    Product.objects.update(favorite_count=7)
+
+    call_command("reconcile_favorite_counts", "--batch-size", "1", stdout=StringIO())
+    assert sorted(Product.objects.values_list('favorite_count', flat=True)) == [1, 1]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [{}, {'page_size': 1, 'ordering': '-price'}, {'min_price': 'cheap'}])
+def test_async_product_list_view(api_client, create_products, create_product, params):
+    sync = api_client.get(reverse('product-list-create'), params)
+    response = api_client.get(reverse('product-list-async'), params)
+    assert response.status_code == sync.status_code
+    assert response.content == sync.content.replace(b'/products/', b'/products/async/')
+
+
+@pytest.mark.django_db
+def test_async_product_detail_view(api_client, create_product):
+    url = reverse('product-detail-async', kwargs={'pk': create_product.pk})
+    response = api_client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == api_client.get(reverse('product-detail', kwargs={'pk': create_product.pk})).content
+
+    response = api_client.get(reverse('product-detail-async', kwargs={'pk': 1232}))
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_product_read_serializer_same_json(create_products, create_product):
+    Product.objects.create(name="socks", description="Ünïcode \"quoted\" socks", price="0.50")
+    queryset = Product.objects.order_by('id')
+
+    expected = JSONRenderer().render(ProductSerializer(queryset, many=True).data)
+    fast = JSONRenderer().render(ProductReadSerializer(queryset.values(*ProductReadSerializer.fields), many=True).data)
+    assert fast == expected
+
+
+def parse_metrics(text):
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            series, value = line.rsplit(' ', 1)
+            samples[series] = float(value)
+    return samples
+
+
+@pytest.mark.django_db
+def test_metrics_per_view(api_client, create_products, create_superuser):
+    assert api_client.get(API.PRODUCT_URL).status_code == status.HTTP_200_OK
+    api_client.get(reverse('product-detail', kwargs={'pk': 1232}))
+
+    # Без аутентификации и не с разрешенного адреса счетчики не отдаются
+    assert api_client.get(reverse('metrics')).status_code == status.HTTP_401_UNAUTHORIZED
+    api_client.force_authenticate(user=create_superuser)
+    response = api_client.get(reverse('metrics'))
+    assert response.status_code == status.HTTP_200_OK
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    samples = parse_metrics(response.content.decode())
+
+    view = '{view="product-list-create"}'
+    assert samples['http_requests_total{method="GET",status="200",view="product-list-create"}'] == 1
+    assert samples['http_requests_total{method="GET",status="404",view="product-detail"}'] == 1
+    assert samples['http_request_duration_seconds_count' + view] == 1
+    # Keyset-страница - один SELECT, без COUNT(*)
+    assert samples['http_db_queries_sum' + view] == 1
+    assert samples['http_db_query_duration_seconds_total' + view] > 0
+    assert samples['http_response_size_bytes_count' + view] == 1
+    assert samples['http_response_size_bytes_bucket{view="product-list-create",le="+Inf"}'] == 1
+    assert 'auth_token_cache_misses_total' in samples
+
+
+@pytest.mark.django_db
+def test_metrics_merged_across_processes(api_client, create_products, settings, tmp_path):
+    settings.METRICS_DIR = str(tmp_path)
+    # Prometheus опрашивает с разрешенного адреса без токена
+    settings.METRICS_ALLOWED_IPS = ['127.0.0.1']
+    api_client.get(API.PRODUCT_URL)
+    # Снимок другого (уже завершенного) воркера: счетчики суммируются, gauge отбрасываются
+    histogram = [0] * 11 + [0.5, 3]
+    histogram[3] = 3
+    (tmp_path / '999999999.json').write_text(json.dumps({
+        'pid': 999999999,
+        'counters': [
+            ['http_requests_total', {'view': 'product-list-create', 'method': 'GET', 'status': '200'}, 4],
+            ['login_hash_in_flight', {}, 100],
+        ],
+        'histograms': [['http_request_duration_seconds', {'view': 'product-list-create'}, histogram]],
+    }))
+
+    samples = parse_metrics(api_client.get(reverse('metrics')).content.decode())
+    assert samples['http_requests_total{method="GET",status="200",view="product-list-create"}'] == 5
+    assert samples['http_request_duration_seconds_count{view="product-list-create"}'] == 4
+    assert samples['login_hash_in_flight'] == 0
+    assert (tmp_path / '{}.json'.format(os.getpid())).exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.urls('root.urls_api')
+def test_api_only_profile(api_client, create_products, settings):
+    from root import settings_api
+    settings.MIDDLEWARE = settings_api.MIDDLEWARE
+
+    response = api_client.get(API.PRODUCT_URL)
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()['results']) == 2
+    assert api_client.get('/admin/').status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_api_only_profile_serves_json_only(settings):
+    # Классы рендереров DRF читаются при импорте, поэтому профиль проверяется
+    # в отдельном процессе, запущенном с DJANGO_SETTINGS_MODULE=root.settings_api
+    script = (
+        "import json, django; django.setup(); "
+        "from django.conf import settings; from django.db import connection; from django.test import Client; "
+        "from django.test.utils import setup_test_environment; setup_test_environment(); "
+        "connection.creation.create_test_db(verbosity=0); client = Client(); "
+        "response = client.get('/products/', HTTP_ACCEPT='text/html,*/*;q=0.8'); "
+        "print(json.dumps({'status': response.status_code, 'content_type': response['Content-Type'], "
+        "'admin': client.get('/admin/').status_code, 'apps': settings.INSTALLED_APPS}))"
+    )
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                            env=dict(os.environ, PYTHONPATH=str(settings.BASE_DIR),
+                                     DJANGO_SETTINGS_MODULE='root.settings_api')).stdout
+    result = json.loads(output)
+    # Браузерный Accept: вместо browsable API отдается JSON
+    assert result['status'] == status.HTTP_200_OK
+    assert result['content_type'] == 'application/json'
+    assert result['admin'] == status.HTTP_404_NOT_FOUND
+    assert 'django.contrib.admin' not in result['apps'] and 'django.contrib.staticfiles' not in result['apps']
+
+
+def read_changes(api_client, **params):
+    response = api_client.get(reverse('product-changes'), params)
+    assert response.status_code == status.HTTP_200_OK
+    return response.data
+
+
+@pytest.mark.django_db
+def test_product_changes_feed_reads_primary(api_client, create_products, settings):
+    # Объявленная реплика не настроена в DATABASES: чтение с нее упало бы
+    settings.DATABASE_REPLICAS = ['replica1']
+    settings.PRODUCT_CHANGES_LAG = 0
+    assert len(read_changes(api_client)['upserts']) == 2
+
+
+@pytest.mark.django_db
+def test_product_changes_feed(api_client, create_products, create_product, settings):
+    settings.PRODUCT_CHANGES_LAG = 0
+    tshirt, jacket = create_products
+
+    # Первая синхронизация постранично отдает весь каталог
+    first = read_changes(api_client, limit=2)
+    assert first['has_more'] and first['deletions'] == []
+    second = read_changes(api_client, since=first['next'], limit=2)
+    assert not second['has_more']
+    assert [p['id'] for p in first['upserts'] + second['upserts']] == [tshirt.id, jacket.id, create_product.id]
+
+    tshirt.price = 600
+    tshirt.save()
+    jacket_id = jacket.id
+    jacket.delete()
+    coat = Product.objects.create(name="coat", description="Warm coat", price=2000)
+
+    changes = read_changes(api_client, since=second['next'])
+    assert [p['id'] for p in changes['upserts']] == [tshirt.id, coat.id]
+    assert changes['upserts'][0]['price'] == '600.00'
+    assert changes['deletions'] == [jacket_id]
+
+    # Больше изменений нет
+    nothing = read_changes(api_client, since=changes['next'])
+    assert nothing['upserts'] == [] and nothing['deletions'] == []
+
+
+@pytest.mark.django_db
+def test_product_changes_feed_holds_back_recent(api_client, create_products, settings):
+    settings.PRODUCT_CHANGES_LAG = 60
+    assert read_changes(api_client)['upserts'] == []
+
+
+@pytest.mark.django_db
+def test_product_changes_feed_bad_cursor(api_client, settings):
+    response = api_client.get(reverse('product-changes'), {'since': 'garbage'})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    response = api_client.get(reverse('product-changes'), {'limit': 0})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    old = '2000-01-01T00:00:00+00:00'
+    response = api_client.get(reverse('product-changes'), {'since': encode_cursor([old, 1], [old, None])})
+    assert response.status_code == status.HTTP_410_GONE
+
+    # Время без часового пояса и pk вне 64-битного диапазона - неверный курсор, а не 500
+    now, naive = timezone.now().isoformat(), '2030-01-01T00:00:00'
+    for since in (encode_cursor([now, None], [naive, None]), encode_cursor([naive, 1], [now, None]),
+                  encode_cursor([now, 10 ** 30], [now, None])):
+        assert api_client.get(reverse('product-changes'), {'since': since}).status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_product_import_updates_change_time(create_product, tmp_path):
+    before = create_product.updated_at
+    path = tmp_path / "products.jsonl"
+    path.write_text(json.dumps({"name": "jeans", "description": "New", "price": "99"}))
+    call_command("import_products", str(path), "--upsert-key", "name", stdout=StringIO(), stderr=StringIO())
+    create_product.refresh_from_db()
+    assert create_product.updated_at > before
+
+
+@pytest.mark.django_db
+def test_prune_product_tombstones_command(create_products):
+    old, recent = create_products
+    recent_id = recent.id
+    old.delete()
+    ProductTombstone.objects.update(deleted_at=timezone.now() - datetime.timedelta(days=31))
+    recent.delete()
+
+    out = StringIO()
+    call_command('prune_product_tombstones', stdout=out)
+    assert 'Deleted 1' in out.getvalue()
+    assert list(ProductTombstone.objects.values_list('product_id', flat=True)) == [recent_id]
+
+
+@pytest.mark.django_db
+def test_product_multi_get(api_client, create_products, create_product):
+    tshirt, jacket = create_products
+    ids = [create_product.id, 9999, tshirt.id, create_product.id]
+
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(API.PRODUCT_URL, {'ids': ','.join(map(str, ids))})
+    assert response.status_code == status.HTTP_200_OK
+    assert len(queries) == 1
+    # Тот же формат, что у /products/<pk>/, в порядке запроса, без повторов
+    assert response.data['results'] == [ProductSerializer(create_product).data, ProductSerializer(tshirt).data]
+    assert response.data['missing'] == [9999]
+
+    response = api_client.post(reverse('product-lookup'), {'ids': ids}, format='json')
+    assert response.status_code == status.HTTP_200_OK
+    assert [product['id'] for product in response.data['results']] == [create_product.id, tshirt.id]
+    assert response.data['missing'] == [9999]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('ids', ['', '1,x', '0', ','.join(['1'] * 3), '1,%d' % 10 ** 30])
+def test_product_multi_get_wrong_ids(api_client, settings, ids):
+    settings.PRODUCT_LOOKUP_MAX_IDS = 2
+    response = api_client.get(API.PRODUCT_URL, {'ids': ids})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    response = api_client.post(reverse('product-lookup'), {'ids': ids}, format='json')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def similar_index():
+    return (sorted(ProductCooccurrence.objects.values_list('product_id', 'other_id', 'count')),
+            sorted(SimilarProduct.objects.values_list('product_id', 'similar_id', 'score')))
+
+
+@pytest.mark.django_db
+def test_similar_product_view(api_client, create_products, create_product, settings):
+    settings.SIMILAR_PRODUCTS_TOP_K = 2
+    tshirt, jacket = create_products
+    coat = Product.objects.create(name="coat", description="Warm coat", price=900)
+    users = [get_user_model().objects.create_user(username="user%d" % i, email="user%d@gmail.com" % i,
+                                                  password=None) for i in range(3)]
+    users[0].favorites.add(tshirt, jacket, create_product)
+    users[1].favorites.add(tshirt, jacket)
+    users[2].favorites.add(tshirt, create_product, coat)
+
+    url = reverse('product-similar', args=[tshirt.id])
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    assert len(queries) == 1
+    # Пара с курткой у двух пользователей, с джинсами тоже у двух; пальто не входит в top-2
+    assert response.data == [dict(ProductSerializer(jacket).data, score=2),
+                             dict(ProductSerializer(create_product).data, score=2)]
+
+    users[1].favorites.remove(jacket)
+    response = api_client.get(url)
+    assert [(item['name'], item['score']) for item in response.data] == [("jeans", 2), ("jacket", 1)]
+
+    response = api_client.get(reverse('product-similar', args=[jacket.id]))
+    assert [(item['name'], item['score']) for item in response.data] == [("T-shirt", 1), ("jeans", 1)]
+
+    users[2].favorites.clear()
+    assert api_client.get(reverse('product-similar', args=[coat.id])).data == []
+    assert api_client.get(reverse('product-similar', args=[9999])).status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_similar_products_incremental_matches_rebuild(create_products, create_product):
+    from user.favorites import update_favorites
+
+    tshirt, jacket = create_products
+    users = [get_user_model().objects.create_user(username="user%d" % i, email="user%d@gmail.com" % i,
+                                                  password=None) for i in range(3)]
+    users[0].favorites.add(tshirt, jacket)
+    update_favorites(users[1], add=[tshirt.id, create_product.id, jacket.id])
+    jacket.user_set.add(users[2])
+    users[2].favorites.add(create_product)
+    update_favorites(users[1], remove=[tshirt.id])
+    tshirt.user_set.clear()
+    users[0].favorites.remove(create_product)
+    incremental = similar_index()
+    assert ProductCooccurrence.objects.filter(count=0).count() == 0
+
+    out = StringIO()
+    call_command("rebuild_similar_products", stdout=out)
+    assert similar_index() == incremental
+    assert "Indexed 2 product pair(s)" in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_similar_products_partial_rerank_matches_rebuild(settings):
+    import random
+
+    # Маленький top-K: пары часто входят в него и выпадают из него
+    settings.SIMILAR_PRODUCTS_TOP_K = 2
+    products = Product.objects.bulk_create([Product(name="item%d" % i, description="item", price=100)
+                                            for i in range(6)])
+    users = [get_user_model().objects.create_user(username="user%d" % i, email="user%d@gmail.com" % i,
+                                                  password=None) for i in range(8)]
+    pick = random.Random(4352)
+    for _ in range(200):
+        user, product = pick.choice(users), pick.choice(products)
+        if pick.random() < 0.05:
+            product.user_set.clear()
+        elif user.favorites.filter(id=product.id).exists():
+            user.favorites.remove(product)
+        else:
+            user.favorites.add(product)
+    incremental = similar_index()
+
+    call_command("rebuild_similar_products", stdout=StringIO())
+    assert similar_index() == incremental
+
+
+@pytest.mark.django_db
+def test_similar_products_skip_negative_pairs(create_products, create_user):
+    tshirt, jacket = create_products
+    # Связи, добавленные в обход сигналов (до построения индекса)
+    get_user_model().favorites.through.objects.bulk_create([
+        get_user_model().favorites.through(user=create_user, product=product) for product in create_products
+    ])
+    Product.objects.update(favorite_count=1)
+    create_user.favorites.remove(tshirt)
+    assert ProductCooccurrence.objects.get(product=jacket, other=tshirt).count == -1
+    assert not SimilarProduct.objects.exists()
+
+
+def price_stats_rows():
+    return [(bucket.lower, bucket.upper, bucket.count, bucket.total_cents, bucket.min_price, bucket.max_price)
+            for bucket in PriceBucket.objects.all()]
+
+
+@pytest.mark.django_db
+def test_product_stats_view(api_client, create_products, settings):
+    settings.PRODUCT_PRICE_BUCKETS = (0, 500, 1000)
+    # Товары фикстуры созданы bulk_create: сводка строится при первом чтении
+    response = api_client.get(reverse('product-stats'))
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data == {
+        'count': 2, 'min': '540.00', 'max': '740.00', 'avg': '640.00',
+        'buckets': [{'min': '0.00', 'max': '500.00', 'count': 0},
+                    {'min': '500.00', 'max': '1000.00', 'count': 2},
+                    {'min': '1000.00', 'max': None, 'count': 0}],
+    }
+
+    coat = Product.objects.create(name="coat", description="Warm coat", price="1500.50")
+    scarf = Product.objects.create(name="scarf", description="Wool scarf", price=120)
+    tshirt, jacket = create_products
+    tshirt.price = 80
+    tshirt.save()
+    jacket.delete()
+    assert price_stats_rows() == [
+        (bucket.lower, bucket.upper, bucket.count, bucket.total_cents, bucket.min_price, bucket.max_price)
+        for bucket in compute_price_buckets()
+    ]
+
+    # Ответ читает только строки сводки, сколько бы ни было товаров
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(reverse('product-stats'))
+    assert len(queries) == 1
+    assert (response.data['count'], response.data['min'], response.data['max'], response.data['avg']) == (
+        3, '80.00', '1500.50', '566.83')
+    assert [bucket['count'] for bucket in response.data['buckets']] == [2, 0, 1]
+
+    coat.delete()
+    scarf.delete()
+    assert api_client.get(reverse('product-stats')).data['max'] == '80.00'
+
+    # Новые границы корзин - сводка пересобирается (ответ с прошлыми границами еще в кэше)
+    settings.PRODUCT_PRICE_BUCKETS = (0, 100)
+    bump_catalog_version()
+    response = api_client.get(reverse('product-stats'))
+    assert [bucket['count'] for bucket in response.data['buckets']] == [1, 0]
+
+
+@pytest.mark.django_db
+def test_product_stats_bulk_import(create_product, settings):
+    settings.PRODUCT_PRICE_BUCKETS = (0, 500, 1000)
+    call_command("verify_price_stats", stdout=StringIO())
+    ProductImporter(upsert_key='name').run([
+        {"name": "jeans", "description": "Slim fit", "price": "99.90"},
+        {"name": "coat", "description": "Warm coat", "price": "1200"},
+    ])
+    ProductImporter().run([{"name": "scarf", "description": "Wool scarf", "price": "700"}])
+    expected = [(bucket.lower, bucket.upper, bucket.count, bucket.total_cents, bucket.min_price, bucket.max_price)
+                for bucket in compute_price_buckets()]
+    assert price_stats_rows() == expected
+    assert [row[2] for row in expected] == [1, 1, 1]
+
+
+@pytest.mark.django_db
+def test_verify_price_stats_command(create_products):
+    call_command("verify_price_stats", stdout=StringIO())
+    # Изменение в обход сигналов сводка не видит
+    Product.objects.update(price=50)
+
+    out = StringIO()
+    with pytest.raises(CommandError):
+        call_command("verify_price_stats", "--check", stdout=out)
+    assert "Bucket 500.00: count is 2, expected 0" in out.getvalue()
+
+    # Исправление сводки сбрасывает закэшированные ответы каталога во всех воркерах
+    version = get_version_cache().get(VERSION_KEY)
+    call_command("verify_price_stats", stdout=StringIO())
+    assert get_version_cache().get(VERSION_KEY) != version
+    out = StringIO()
+    call_command("verify_price_stats", "--check", stdout=out)
+    assert "up to date" in out.getvalue()
@@ -1,11 +1,26 @@
+import os
+import subprocess
+import sys
+
 import pytest
+from asgiref.sync import async_to_sync
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework.authtoken.models import Token
 from product.models import Product
 from tests.conftest import api_client, create_product, create_product, create_products
 from rest_framework import status
 from constants import API
 from django.urls import reverse
+from django.utils import timezone
+from root.replicas import ReplicaRouter, read_from_replica
+from root.metrics import registry
+from user.authentication import token_cache
+from user.hashing import HasherOverloaded, password_hasher
+from user.models import Favorite, User
+from user.throttling import throttle_store
 
 
 @pytest.mark.django_db
@@ -26,6 +41,12 @@ def test_register_view_user(api_client):
     # Проверяем, действительно ли у нас создался данный пользователь
     assert user_model.objects.filter(email=data["email"]).exists()
 
+    # Пароль сохранен хэшем, и с ним можно сразу войти
+    assert user_model.objects.get(email=data["email"]).password != data["password"]
+    response = api_client.post(API.LOGIN_URL, {"email": data["email"], "password": data["password"]},
+                               format="json")
+    assert response.status_code == status.HTTP_200_OK
+
 
 @pytest.mark.django_db
 def test_register_view_user_wrong_data(api_client):
@@ -163,7 +184,7 @@ def test_favorite_view_get_list_products(api_client, create_user, create_product
     assert response.status_code == status.HTTP_200_OK
 
     # Проверяем кол-во избранных товаров
-    assert len(response.data) == 2
+    assert len(response.data['results']) == 2
 
 
 @pytest.mark.django_db
@@ -205,6 +226,8 @@ def test_favorite_view_add_product_to_favorite(api_client, create_product, creat
     # Неверные данные: поле 'product_id' не является строкой
     response = api_client.post(API.FAVORITE_URL, {"product_id": "ss"}, format="json")
     assert response.status_code == status.HTTP_400_BAD_REQUEST
+    response = api_client.post(API.FAVORITE_URL, {"product_id": 10 ** 30}, format="json")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
 
 
 @pytest.mark.django_db
@@ -237,3 +260,496 @@ def test_favorite_view_delete_product_from_favorite(api_client, create_product,
     # Неверные данные: несуществующий id товара
     response = api_client.delete(API.FAVORITE_URL + '2434' + '/')
     assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_token_authentication_cache(api_client, create_user, django_assert_num_queries):
+    token = Token.objects.get_or_create(user=create_user)[0]
+    api_client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+    before = token_cache.stats()
+
+    # Первый запрос достает токен и пользователя из БД
+    with django_assert_num_queries(2):
+        assert api_client.get(API.FAVORITE_URL).status_code == status.HTTP_200_OK
+    # Дальше остается только запрос избранного, аутентификация идет из кэша
+    with django_assert_num_queries(1):
+        assert api_client.get(API.FAVORITE_URL).status_code == status.HTTP_200_OK
+
+    response = api_client.get(reverse('auth-stats'))
+    # Запрос статистики тоже аутентифицирован из кэша
+    assert response.data['token_cache']['hits'] - before['hits'] == 2
+    assert response.data['token_cache']['misses'] - before['misses'] == 1
+
+    # После выхода токен из кэша больше не принимается
+    assert api_client.post(API.LOGOUT_URL).status_code == status.HTTP_200_OK
+    assert api_client.get(API.FAVORITE_URL).status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+def test_token_cache_shared_between_workers(create_user):
+    from user.authentication import TokenCache
+
+    token = Token.objects.get_or_create(user=create_user)[0]
+    token_cache.set(token.key, create_user, token)
+    # Второй экземпляр - как кэш другого воркера над тем же общим хранилищем
+    other_worker = TokenCache(ttl=60)
+    user, _ = other_worker.get(token.key)
+    # Каждое чтение - своя копия пользователя
+    assert user == create_user and user is not token_cache.get(token.key)[0]
+
+    other_worker.invalidate_user(create_user.pk)
+    assert token_cache.get(token.key) is None
+
+
+@pytest.mark.django_db
+def test_token_cache_kept_on_unrelated_changes(api_client, create_user, create_product):
+    token = Token.objects.get_or_create(user=create_user)[0]
+    api_client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+    assert api_client.get(API.FAVORITE_URL).status_code == status.HTTP_200_OK
+
+    # Избранное и поля, не влияющие на аутентификацию, токен из кэша не выбрасывают
+    response = api_client.post(API.FAVORITE_URL, {"product_id": create_product.id}, format="json")
+    assert response.status_code == status.HTTP_201_CREATED
+    create_user.last_login = timezone.now()
+    create_user.save()
+    assert api_client.get(API.FAVORITE_URL).status_code == status.HTTP_200_OK
+    assert token_cache.stats()['misses'] == 1
+
+
+@pytest.mark.django_db
+def test_token_authentication_cache_user_deactivated(api_client, create_user):
+    token = Token.objects.get_or_create(user=create_user)[0]
+    api_client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+    assert api_client.get(API.FAVORITE_URL).status_code == status.HTTP_200_OK
+
+    create_user.is_active = False
+    create_user.save()
+    assert api_client.get(API.FAVORITE_URL).status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.fixture
+def thread_password_hasher(settings):
+    settings.LOGIN_HASH_EXECUTOR = 'thread'
+    settings.LOGIN_HASH_WORKERS = 2
+    password_hasher.shutdown()
+    yield password_hasher
+    password_hasher.shutdown()
+
+
+@pytest.mark.django_db
+def test_async_login_view(api_client, thread_password_hasher):
+    user = get_user_model().objects.create_user(username="test", email="test@gmail.com", password="test4356")
+    url = reverse('login-async')
+
+    response = api_client.post(url, {"email": "test@gmail.com", "password": "test4356"}, format="json")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['token'] == Token.objects.get(user=user).key
+
+    response = api_client.post(url, {"email": "test@gmail.com", "password": "test1111"}, format="json")
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = api_client.post(url, {"email": "vergo@gmail.com", "password": "11sjs1123"}, format="json")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'error' in response.json()
+
+
+@pytest.mark.django_db
+def test_async_login_view_upgrades_hash(api_client, thread_password_hasher):
+    # Пароль захэширован устаревшим алгоритмом
+    user = get_user_model().objects.create_user(username="test", email="test@gmail.com", password=None)
+    user.password = make_password("test4356", hasher="pbkdf2_sha1")
+    user.save()
+
+    response = api_client.post(reverse('login-async'), {"email": "test@gmail.com", "password": "test4356"},
+                               format="json")
+    assert response.status_code == status.HTTP_200_OK
+
+    user.refresh_from_db()
+    assert user.password.startswith(get_hasher('default').algorithm + '$')
+    assert user.check_password("test4356")
+
+
+@pytest.mark.django_db
+def test_async_login_view_skips_upgrade_when_overloaded(api_client, thread_password_hasher, monkeypatch):
+    user = get_user_model().objects.create_user(username="test", email="test@gmail.com", password=None)
+    user.password = make_password("test4356", hasher="pbkdf2_sha1")
+    user.save()
+
+    async def overloaded(password):
+        raise HasherOverloaded()
+    monkeypatch.setattr(password_hasher, 'make', overloaded)
+
+    # Верный пароль - вход успешен, хэш пересчитается при следующем входе
+    response = api_client.post(reverse('login-async'), {"email": "test@gmail.com", "password": "test4356"},
+                               format="json")
+    assert response.status_code == status.HTTP_200_OK
+    user.refresh_from_db()
+    assert user.password.startswith('pbkdf2_sha1$')
+
+
+@pytest.mark.django_db
+def test_async_login_view_overloaded(api_client, thread_password_hasher, settings):
+    get_user_model().objects.create_user(username="test", email="test@gmail.com", password="test4356")
+    settings.LOGIN_HASH_WORKERS = 1
+    settings.LOGIN_HASH_MAX_QUEUE = 0
+    rejected = password_hasher.stats()['rejected']
+
+    # Единственный воркер занят, очереди нет - запрос отклоняется без хэширования
+    password_hasher.in_flight += 1
+    try:
+        response = api_client.post(reverse('login-async'), {"email": "test@gmail.com", "password": "test4356"},
+                                   format="json")
+    finally:
+        password_hasher.in_flight -= 1
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert password_hasher.stats()['rejected'] == rejected + 1
+
+
+def test_password_hasher_process_pool(settings):
+    settings.LOGIN_HASH_EXECUTOR = 'process'
+    settings.LOGIN_HASH_WORKERS = 1
+    password_hasher.shutdown()
+    encoded = make_password("test4356")
+    try:
+        assert async_to_sync(password_hasher.verify)("test4356", encoded) == (True, False)
+        assert async_to_sync(password_hasher.verify)("wrong", encoded) == (False, False)
+    finally:
+        password_hasher.shutdown()
+
+
+@pytest.mark.django_db
+def test_favorite_batch_view(api_client, create_user, create_products, create_product):
+    user = create_user
+    tshirt, jacket = create_products
+    user.favorites.add(jacket)
+    api_client.force_authenticate(user=user)
+
+    data = {"add": [tshirt.id, jacket.id, 9999], "remove": [create_product.id, 8888]}
+    response = api_client.post(reverse('user-favorite-batch'), data, format="json")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['added'] == [tshirt.id]
+    assert response.data['removed'] == []
+    assert response.data['ignored'] == {
+        'not_found': [8888, 9999],
+        'already_in_favorites': [jacket.id],
+        'not_in_favorites': [create_product.id],
+    }
+    assert set(user.favorites.values_list('id', flat=True)) == {tshirt.id, jacket.id}
+
+    response = api_client.post(reverse('user-favorite-batch'),
+                               {"add": [create_product.id], "remove": [tshirt.id, jacket.id]}, format="json")
+    assert response.data['added'] == [create_product.id]
+    assert response.data['removed'] == sorted([tshirt.id, jacket.id])
+    assert list(user.favorites.values_list('id', flat=True)) == [create_product.id]
+
+
+@pytest.mark.django_db
+def test_update_favorites_reads_state_under_lock(create_user, create_products):
+    from user.favorites import update_favorites
+
+    tshirt, jacket = create_products
+    with CaptureQueriesContext(connection) as queries:
+        update_favorites(create_user, add=[tshirt.id], remove=[jacket.id])
+    statements = [query['sql'] for query in queries.captured_queries]
+    # Текущее состояние читается в транзакции уже после блокировки строки пользователя
+    lock = next(i for i, sql in enumerate(statements) if sql.startswith('UPDATE "user_user"'))
+    read = next(i for i, sql in enumerate(statements) if 'EXISTS' in sql)
+    assert lock == 1 and lock < read
+    assert list(create_user.favorites.values_list('id', flat=True)) == [tshirt.id]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('data', [{}, {"add": [1], "remove": [1]}, {"add": ["ss"]}, {"add": [10 ** 30]}])
+def test_favorite_batch_view_wrong_data(api_client, create_user, data):
+    api_client.force_authenticate(user=create_user)
+    response = api_client.post(reverse('user-favorite-batch'), data, format="json")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_async_favorite_view_get_list_products(api_client, create_user, create_products):
+    create_user.favorites.add(*create_products)
+    token = Token.objects.get_or_create(user=create_user)[0]
+    url = reverse('user-favorite-async')
+
+    response = api_client.get(url)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert response['WWW-Authenticate'] == 'Token'
+
+    api_client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+    response = api_client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()['results']) == 2
+    assert response.content == api_client.get(API.FAVORITE_URL).content
+
+    api_client.credentials(HTTP_AUTHORIZATION='Token wrong')
+    assert api_client.get(url).status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.fixture
+def routed_reads(settings, monkeypatch):
+    # Реплика объявлена, но запросы фактически идут в тестовую БД:
+    # записываем только решения роутера
+    settings.DATABASE_REPLICAS = ['replica1']
+    decisions = []
+    db_for_read = ReplicaRouter.db_for_read
+
+    def record(self, model, **hints):
+        decisions.append((model._meta.label, db_for_read(self, model, **hints)))
+        return None
+
+    monkeypatch.setattr(ReplicaRouter, 'db_for_read', record)
+    return decisions
+
+
+@pytest.mark.django_db
+def test_favorite_reads_routed_to_replica(api_client, create_user, create_product, routed_reads):
+    token = Token.objects.get_or_create(user=create_user)[0]
+    api_client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+
+    assert api_client.get(API.FAVORITE_URL).status_code == status.HTTP_200_OK
+    # Токен проверяется на primary, Избранное читается с реплики
+    assert ('authtoken.Token', None) in routed_reads
+    assert ('product.Product', 'replica1') in routed_reads
+
+    # Сразу после изменения Избранного пользователь читает с primary
+    response = api_client.post(API.FAVORITE_URL, {"product_id": create_product.id}, format="json")
+    assert response.status_code == status.HTTP_201_CREATED
+    routed_reads.clear()
+    response = api_client.get(API.FAVORITE_URL)
+    assert len(response.data['results']) == 1
+    assert ('product.Product', None) in routed_reads
+    assert ('product.Product', 'replica1') not in routed_reads
+
+
+@pytest.mark.django_db
+def test_favorites_pin_shared_and_reverse_clear(create_user, create_product):
+    from django.core.cache import caches
+
+    from root.replicas import is_pinned, pin_key
+
+    create_product.user_set.add(create_user)
+    # Отметка лежит в общем кэше и видна любому воркеру
+    assert caches['shared'].get(pin_key(create_user.pk)) is True
+    caches['shared'].clear()
+
+    create_product.user_set.clear()
+    assert is_pinned(create_user.pk)
+
+
+@pytest.mark.django_db
+def test_catalog_cache_filled_from_primary(api_client, create_product, routed_reads):
+    # Ответ, который попадет в кэш каталога, читается с primary
+    assert api_client.get(API.PRODUCT_URL).status_code == status.HTTP_200_OK
+    assert ('product.Product', None) in routed_reads
+    assert ('product.Product', 'replica1') not in routed_reads
+
+    # Некэшируемые чтения каталога по-прежнему идут на реплику
+    routed_reads.clear()
+    assert api_client.get(reverse('product-popular')).status_code == status.HTTP_200_OK
+    assert ('product.Product', 'replica1') in routed_reads
+
+
+@pytest.mark.django_db
+def test_price_stats_rebuilt_from_primary(create_product, routed_reads):
+    from product.stats import read_price_stats
+
+    with read_from_replica():
+        read_price_stats()
+    # Сводка пересобирается по товарам с primary, а не с отстающей реплики
+    assert ('product.PriceBucket', 'replica1') in routed_reads
+    assert ('product.Product', 'replica1') not in routed_reads
+
+
+def test_replica_router_writes_and_auth_on_primary(settings):
+    settings.DATABASE_REPLICAS = ['replica1']
+    router = ReplicaRouter()
+    with read_from_replica() as alias:
+        assert alias == 'replica1'
+        assert router.db_for_read(Product) == 'replica1'
+        assert router.db_for_read(get_user_model()) is None
+        assert router.db_for_read(Token) is None
+        assert router.db_for_write(Product) == 'default'
+    assert router.db_for_read(Product) is None
+
+
+def signed_login(api_client, url=API.LOGIN_URL):
+    response = api_client.post(url, {"email": "test@gmail.com", "password": "test4352", "mode": "signed"},
+                               format="json")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['token_type'] == 'Bearer'
+    return response.json()['token']
+
+
+@pytest.mark.django_db
+def test_signed_token_login_and_logout(api_client, create_user, create_product):
+    create_user.favorites.add(create_product)
+    signed = signed_login(api_client)
+    assert not Token.objects.filter(user=create_user).exists()
+    api_client.credentials(HTTP_AUTHORIZATION='Bearer ' + signed)
+
+    assert api_client.get(API.FAVORITE_URL).status_code == status.HTTP_200_OK
+    # Повторный запрос: подпись проверяется в памяти, пользователь из кэша -
+    # единственный запрос к БД читает само Избранное
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(API.FAVORITE_URL)
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.data['results']) == 1
+    assert len(queries) == 1
+
+    # Обычный токен работает параллельно и переживает выход из signed-сессии
+    key = Token.objects.create(user=create_user).key
+    assert api_client.post(API.LOGOUT_URL).status_code == status.HTTP_200_OK
+    create_user.refresh_from_db()
+    assert create_user.token_generation == 1
+    response = api_client.get(API.FAVORITE_URL)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert response.data['detail'] == 'Token has been revoked.'
+
+    api_client.credentials(HTTP_AUTHORIZATION='Token ' + key)
+    assert api_client.get(API.FAVORITE_URL).status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+def test_signed_token_rejected(api_client, create_user, settings):
+    signed = signed_login(api_client)
+
+    api_client.credentials(HTTP_AUTHORIZATION='Bearer ' + signed[:-1] + ('A' if signed[-1] != 'A' else 'B'))
+    assert api_client.get(API.FAVORITE_URL).status_code == status.HTTP_401_UNAUTHORIZED
+
+    settings.SIGNED_TOKEN_MAX_AGE = -1
+    api_client.credentials(HTTP_AUTHORIZATION='Bearer ' + signed)
+    response = api_client.get(API.FAVORITE_URL)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert response.data['detail'] == 'Token has expired.'
+
+    api_client.credentials()
+    response = api_client.post(API.LOGIN_URL, {"email": "test@gmail.com", "password": "test4352", "mode": "jwt"},
+                               format="json")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_async_signed_token(api_client, create_user, create_products, thread_password_hasher):
+    create_user.favorites.add(*create_products)
+    signed = signed_login(api_client, reverse('login-async'))
+    api_client.credentials(HTTP_AUTHORIZATION='Bearer ' + signed)
+    response = api_client.get(reverse('user-favorite-async'))
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()['results']) == 2
+
+
+@pytest.mark.django_db
+def test_favorite_view_pages_newest_first(api_client, create_user, create_products, create_product):
+    tshirt, jacket = create_products
+    # Добавляем по одному: время добавления задает порядок списка
+    for product in (jacket, create_product, tshirt):
+        create_user.favorites.add(product)
+    api_client.force_authenticate(user=create_user)
+
+    ids = []
+    url = API.FAVORITE_URL + '?page_size=2'
+    while url:
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        # Одна страница - один запрос с JOIN, без COUNT(*)
+        assert len(queries) == 1
+        ids.extend(product['id'] for product in response.data['results'])
+        url = response.data['next']
+    assert ids == [tshirt.id, create_product.id, jacket.id]
+
+    favorite = Favorite.objects.get(user=create_user, product=tshirt)
+    assert favorite.created_at > Favorite.objects.get(user=create_user, product=jacket).created_at
+
+
+@pytest.fixture
+def strict_throttle(settings):
+    settings.AUTH_THROTTLE_RATES = {'login_ip': '4/min', 'login_email': '2/min',
+                                    'register_ip': '2/hour', 'register_email': None}
+
+
+@pytest.mark.django_db
+def test_login_throttled_before_hashing(api_client, create_user, strict_throttle, monkeypatch):
+    checks = []
+    check_password = User.check_password
+    monkeypatch.setattr(User, 'check_password', lambda self, raw: checks.append(raw) or check_password(self, raw))
+
+    for password in ("wrong1", "wrong2"):
+        response = api_client.post(API.LOGIN_URL, {"email": "test@gmail.com", "password": password}, format="json")
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    # Ведро адреса пусто: пароль уже не проверяется, даже верный и с другим регистром
+    response = api_client.post(API.LOGIN_URL, {"email": " Test@gmail.com", "password": "test4352"}, format="json")
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert 0 < int(response['Retry-After']) <= 30
+    assert checks == ["wrong1", "wrong2"]
+
+    # Другой адрес с того же IP упирается в ведро IP (отклоненные попытки тоже его тратят)
+    response = api_client.post(API.LOGIN_URL, {"email": "other@gmail.com", "password": "x"}, format="json")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    response = api_client.post(API.LOGIN_URL, {"email": "other@gmail.com", "password": "x"}, format="json")
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+    counters, _ = registry.collect()
+    assert counters[('auth_throttle_allowed_total', (('scope', 'login_email'),))] == 4
+    assert counters[('auth_throttle_rejected_total', (('scope', 'login_email'),))] == 1
+    assert counters[('auth_throttle_rejected_total', (('scope', 'login_ip'),))] == 1
+
+
+@pytest.mark.django_db
+def test_register_throttled(api_client, strict_throttle):
+    for number in range(3):
+        response = api_client.post(API.REGISTER_URL, {"email": "user%d@gmail.com" % number,
+                                                      "username": "user%d" % number,
+                                                      "password": "simplepassword123"}, format="json")
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert list(get_user_model().objects.values_list('username', flat=True).order_by('id')) == ["user0", "user1"]
+    assert throttle_store.stats()['rejected'] == {'register_ip': 1}
+
+
+@pytest.mark.django_db
+def test_throttle_ignores_forwarded_for(api_client, strict_throttle, thread_password_hasher):
+    # Без доверенных прокси X-Forwarded-For задает сам клиент: новое значение
+    # в каждом запросе не должно давать новое ведро по IP
+    for number in range(3):
+        response = api_client.post(API.REGISTER_URL, {"email": "user%d@gmail.com" % number,
+                                                      "username": "user%d" % number,
+                                                      "password": "simplepassword123"},
+                                   format="json", HTTP_X_FORWARDED_FOR="10.0.0.%d" % number)
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+    for number in range(5):
+        response = api_client.post(reverse('login-async'), {"email": "user%d@gmail.com" % number, "password": "x"},
+                                   format="json", HTTP_X_FORWARDED_FOR="10.0.1.%d" % number)
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert throttle_store.stats()['rejected'] == {'register_ip': 1, 'login_ip': 1}
+
+
+@pytest.mark.django_db
+def test_async_login_view_throttled(api_client, create_user, strict_throttle, thread_password_hasher):
+    completed = password_hasher.stats()['completed']
+    for _ in range(2):
+        api_client.post(reverse('login-async'), {"email": "test@gmail.com", "password": "x"}, format="json")
+    response = api_client.post(reverse('login-async'), {"email": "test@gmail.com", "password": "test4352"},
+                               format="json")
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert 'Retry-After' in response
+    assert password_hasher.stats()['completed'] == completed + 2
+
+
+def test_throttle_shared_across_processes(settings, tmp_path):
+    settings.AUTH_THROTTLE_PATH = str(tmp_path / "throttle.sqlite3")
+    assert [throttle_store.take('login_ip', '10.0.0.1', '5/min') for _ in range(3)] == [None] * 3
+
+    # Другой процесс видит те же ведра: из пяти попыток в минуту ему осталось две
+    script = (
+        "from django.conf import settings; "
+        "settings.configure(AUTH_THROTTLE_PATH=%r, AUTH_THROTTLE_RATES={}); "
+        "from user.throttling import throttle_store; "
+        "print(sum(throttle_store.take('login_ip', '10.0.0.1', '5/min') is None for _ in range(4)))"
+    ) % settings.AUTH_THROTTLE_PATH
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                            env=dict(os.environ, PYTHONPATH=str(settings.BASE_DIR))).stdout
+    assert output.strip() == "2"
+    assert throttle_store.take('login_ip', '10.0.0.1', '5/min') > 0
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class UserConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .metrics import register_metrics
+        register_metrics()
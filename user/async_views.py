@@ -0,0 +1,115 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import APIException, NotAuthenticated, Throttled
+from rest_framework.request import Request
+
+from product.async_views import render_error, render_json
+from product.pagination import KeysetPagination
+from product.serializers import ProductReadSerializer
+from root.replicas import read_from_replica
+from .authentication import (LOGIN_MODES, CachedTokenAuthentication, SignedTokenAuthentication,
+                             signed_token_payload)
+from .favorites import favorites_queryset
+from .hashing import HasherOverloaded, password_hasher
+from .models import User
+from .throttling import throttle_wait
+
+
+def parse_body(request):
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+    return request.POST
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncLoginView(View):
+    """
+    Асинхронный вариант LoginView для ASGI (root/asgi.py). Проверка пароля
+    выполняется в ограниченном пуле (user.hashing), поэтому всплеск логинов
+    не занимает воркеры, отдающие каталог.
+    """
+
+    async def post(self, request, *args, **kwargs):
+        data = parse_body(request)
+        if data is None:
+            return JsonResponse({"error": "Malformed request body."}, status=status.HTTP_400_BAD_REQUEST)
+        email = data.get('email')
+        password = data.get('password')
+        mode = data.get('mode', 'token')
+        if mode not in LOGIN_MODES:
+            return JsonResponse({"error": "Unknown token mode."}, status=status.HTTP_400_BAD_REQUEST)
+        wait = await sync_to_async(throttle_wait)(request, 'login', email)
+        if wait is not None:
+            return render_error(Throttled(wait))
+        try:
+            user = await User.objects.aget(email=email)
+        except User.DoesNotExist:
+            return JsonResponse({"error": "User with this email does not exist."},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            valid, must_update = await password_hasher.verify(password, user.password)
+        except HasherOverloaded:
+            response = JsonResponse({"error": "Too many logins in progress, retry later."},
+                                    status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response['Retry-After'] = '1'
+            return response
+        if valid and must_update:
+            # Хэш сделан старыми параметрами - тихо пересчитываем. Пароль уже
+            # проверен: при переполненном пуле пересчет откладывается до следующего входа
+            try:
+                user.password = await password_hasher.make(password)
+            except HasherOverloaded:
+                pass
+            else:
+                await user.asave(update_fields=['password'])
+
+        if not valid:
+            return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+        if mode == 'signed':
+            return JsonResponse(signed_token_payload(user))
+        token, created = await Token.objects.aget_or_create(user=user)
+        return JsonResponse({'token': token.key})
+
+
+class AsyncUserFavoriteView(View):
+    """
+    Асинхронный вариант GET /favorite/: токен проверяется через кэш
+    и async ORM, страница Избранного читается через `async for`.
+    """
+    authenticators = (CachedTokenAuthentication(), SignedTokenAuthentication())
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            result = None
+            for authenticator in self.authenticators:
+                result = await authenticator.aauthenticate(request)
+                if result is not None:
+                    break
+            if result is None:
+                raise NotAuthenticated()
+        except APIException as exc:
+            # Как в DRF: заголовок от первого способа аутентификации
+            exc.auth_header = self.authenticators[0].authenticate_header(request)
+            return render_error(exc)
+        user, token = result
+        drf_request = Request(request)
+        paginator = KeysetPagination()
+        try:
+            with read_from_replica(user.pk):
+                rows = await paginator.apaginate_queryset(favorites_queryset(user), drf_request, self)
+        except APIException as exc:
+            return render_error(exc)
+        data = ProductReadSerializer(rows, many=True).data
+        return render_json(paginator.get_paginated_response(data).data)
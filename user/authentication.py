@@ -0,0 +1,206 @@
+import hashlib
+import threading
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+
+
+class TokenCache:
+    """
+    Кэш `ключ токена -> (user, token)` в Django-кэше AUTH_TOKEN_CACHE_ALIAS,
+    общем для всех воркеров, с временем жизни AUTH_TOKEN_CACHE_TTL.
+
+    Сбрасывается явно: invalidate() при удалении токена, invalidate_user()
+    при выходе и изменении/деактивации пользователя (user.signals) - меняет
+    поколение пользователя, и его записи перестают читаться во всех процессах.
+    Изменения в обход сигналов (QuerySet.update(is_active=False), правка БД
+    вручную) вступают в силу не позже чем через AUTH_TOKEN_CACHE_TTL.
+
+    Каждое чтение распаковывает свою копию User, поэтому один экземпляр
+    не делится между потоками и запросами.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[settings.AUTH_TOKEN_CACHE_ALIAS]
+
+    def entry_key(self, key):
+        # Сам токен в ключ кэша не кладем
+        return 'auth-token:%s' % hashlib.sha256(key.encode()).hexdigest()
+
+    def generation_key(self, user_id):
+        return 'auth-user-generation:%s' % user_id
+
+    def get(self, key):
+        entry = self.cache.get(self.entry_key(key))
+        if entry is not None:
+            user, token, generation = entry
+            if self.cache.get(self.generation_key(user.pk)) != generation:
+                entry = None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return user, token
+
+    def set(self, key, user, token):
+        generation_key = self.generation_key(user.pk)
+        generation = self.cache.get(generation_key)
+        if generation is None:
+            self.cache.add(generation_key, uuid.uuid4().hex, timeout=None)
+            generation = self.cache.get(generation_key)
+        self.cache.set(self.entry_key(key), (user, token, generation), self.ttl)
+
+    def invalidate(self, key):
+        self.cache.delete(self.entry_key(key))
+
+    def invalidate_user(self, user_id):
+        self.cache.set(self.generation_key(user_id), uuid.uuid4().hex, timeout=None)
+
+    def clear(self):
+        self.cache.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        # Счетчики этого процесса; /metrics/ складывает их по всем воркерам
+        with self._lock:
+            return {'ttl': self.ttl, 'hits': self.hits, 'misses': self.misses}
+
+
+token_cache = TokenCache(settings.AUTH_TOKEN_CACHE_TTL)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication, который для "горячих" токенов не ходит в БД:
+    пара (user, token) берется из token_cache.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user, token)
+        return user, token
+
+    async def aauthenticate(self, request):
+        """
+        Вариант authenticate() для нативных async-представлений (без DRF):
+        промах кэша обслуживается async ORM, без потока на запрос.
+        """
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed(_('Invalid token header.'))
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(_('Invalid token header. '
+                                                    'Token string should not contain invalid characters.'))
+        return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+        model = self.get_model()
+        try:
+            token = await model.objects.select_related('user').aget(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        token_cache.set(key, token.user, token)
+        return token.user, token
+
+
+SIGNED_TOKEN_SALT = 'user.access-token'
+# Режимы POST /login/: "token" - строка authtoken_token, "signed" - подписанный токен
+LOGIN_MODES = ('token', 'signed')
+
+
+def make_access_token(user):
+    """
+    Короткоживущий токен доступа, подписанный HMAC (SECRET_KEY): id пользователя,
+    поколение токенов и время выпуска. Проверяется без обращения к БД.
+    """
+    return signing.dumps({'u': user.pk, 'g': user.token_generation}, salt=SIGNED_TOKEN_SALT)
+
+
+def signed_token_payload(user):
+    # Ответ логина в режиме "signed"
+    return {'token': make_access_token(user), 'token_type': 'Bearer',
+            'expires_in': settings.SIGNED_TOKEN_MAX_AGE}
+
+
+def read_access_token(key):
+    try:
+        payload = signing.loads(key, salt=SIGNED_TOKEN_SALT, max_age=settings.SIGNED_TOKEN_MAX_AGE)
+    except signing.SignatureExpired:
+        raise exceptions.AuthenticationFailed(_('Token has expired.'))
+    except signing.BadSignature:
+        raise exceptions.AuthenticationFailed(_('Invalid token.'))
+    if not isinstance(payload, dict) or not isinstance(payload.get('u'), int) \
+            or not isinstance(payload.get('g'), int):
+        raise exceptions.AuthenticationFailed(_('Invalid token.'))
+    return payload
+
+
+class SignedTokenAuthentication(CachedTokenAuthentication):
+    """
+    Аутентификация по подписанным токенам: `Authorization: Bearer <token>`.
+    Подпись и срок проверяются в памяти, пользователь берется из token_cache
+    (сбрасывается при выходе и изменении пользователя), поэтому "горячий"
+    запрос не обращается к БД. Токен отзывается увеличением
+    User.token_generation вместе со сбросом кэша пользователя.
+    """
+    keyword = 'Bearer'
+
+    def authenticate_credentials(self, key):
+        payload = read_access_token(key)
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+        user_model = get_user_model()
+        try:
+            user = user_model.objects.get(pk=payload['u'])
+        except user_model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return self.check_user(key, user, payload)
+
+    async def aauthenticate_credentials(self, key):
+        payload = read_access_token(key)
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+        user_model = get_user_model()
+        try:
+            user = await user_model.objects.aget(pk=payload['u'])
+        except user_model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return self.check_user(key, user, payload)
+
+    def check_user(self, key, user, payload):
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        if user.token_generation != payload['g']:
+            raise exceptions.AuthenticationFailed(_('Token has been revoked.'))
+        token_cache.set(key, user, payload)
+        return user, payload
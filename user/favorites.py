@@ -0,0 +1,78 @@
+from django.db import router, transaction
+from django.db.models import Exists, F, OuterRef
+from django.db.models.signals import m2m_changed
+
+from product.models import Product
+from product.serializers import ProductReadSerializer
+from .models import User
+
+
+def favorites_queryset(user):
+    """
+    Товары из Избранного пользователя, сначала недавно добавленные, одним
+    запросом с JOIN. Сортировка (created_at, product_id) по убыванию совпадает
+    с индексом user_favorite_created_idx и подходит для keyset-пагинации.
+    """
+    return (Product.objects.filter(favorite__user=user)
+            .annotate(favorited_at=F('favorite__created_at'), favorite_product_id=F('favorite__product_id'))
+            .order_by('-favorited_at', '-favorite_product_id')
+            .values(*ProductReadSerializer.fields, 'favorited_at', 'favorite_product_id'))
+
+
+def update_favorites(user, add=(), remove=()):
+    """
+    Добавляет и удаляет товары из Избранного пачкой за постоянное число запросов:
+    блокировка строки пользователя, одно чтение (существование товаров +
+    текущее состояние одним IN), один bulk INSERT и один DELETE в through-таблицу,
+    все в одной транзакции.
+
+    m2m_changed отправляется так же, как это делают favorites.add()/remove(),
+    поэтому подписчики на изменения Избранного видят и пакетные изменения.
+    """
+    through = User.favorites.through
+    add, remove = set(add), set(remove)
+
+    using = router.db_for_write(through, instance=user)
+    with transaction.atomic(using=using):
+        # Сначала блокируем строку пользователя: параллельные пачки одного
+        # пользователя выполняются по очереди и видят состояние друг после друга,
+        # поэтому сигналы и ответ относятся только к реально записанным строкам.
+        # Пустой UPDATE вместо select_for_update: SQLite его игнорирует, а запись
+        # сразу берет блокировку БД и не упирается в SQLITE_BUSY при повышении
+        User.objects.using(using).filter(pk=user.pk).update(id=F('id'))
+
+        in_favorites = through.objects.filter(user_id=user.pk, product_id=OuterRef('pk'))
+        found = dict(
+            Product.objects.using(using).filter(id__in=add | remove)
+            .annotate(in_favorites=Exists(in_favorites))
+            .values_list('id', 'in_favorites')
+        )
+        current = {product_id for product_id, is_favorite in found.items() if is_favorite}
+        to_add = {product_id for product_id in add if product_id in found} - current
+        to_remove = remove & current
+
+        if to_add:
+            send_changed(user, 'pre_add', to_add, using)
+            through.objects.using(using).bulk_create(
+                [through(user_id=user.pk, product_id=product_id) for product_id in to_add]
+            )
+            send_changed(user, 'post_add', to_add, using)
+        if to_remove:
+            send_changed(user, 'pre_remove', to_remove, using)
+            through.objects.using(using).filter(user_id=user.pk, product_id__in=to_remove).delete()
+            send_changed(user, 'post_remove', to_remove, using)
+
+    return {
+        'added': sorted(to_add),
+        'removed': sorted(to_remove),
+        'ignored': {
+            'not_found': sorted((add | remove) - set(found)),
+            'already_in_favorites': sorted(add & current),
+            'not_in_favorites': sorted((remove & set(found)) - current),
+        },
+    }
+
+
+def send_changed(user, action, pk_set, using):
+    m2m_changed.send(sender=User.favorites.through, instance=user, action=action,
+                     reverse=False, model=Product, pk_set=set(pk_set), using=using)
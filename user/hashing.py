@@ -0,0 +1,119 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+
+
+class HasherOverloaded(Exception):
+    pass
+
+
+def _init_worker(settings_module):
+    # Дочерние процессы стартуют через spawn и должны сами поднять Django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def verify_password(password, encoded):
+    """
+    Проверка пароля (выполняется в пуле). Возвращает (valid, must_update):
+    must_update означает, что хэш сделан устаревшим алгоритмом или
+    с другими параметрами и его нужно пересчитать.
+    """
+    if not check_password(password, encoded):
+        return False, False
+    preferred = get_hasher('default')
+    hasher = identify_hasher(encoded)
+    return True, hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+class PasswordHasherPool:
+    """
+    Ограниченный пул для PBKDF2 и других дорогих по CPU операций с паролями.
+    В режиме "process" хэширование идет в отдельных процессах и не держит GIL
+    воркера, обслуживающего остальные запросы.
+
+    Очередь ограничена LOGIN_HASH_MAX_QUEUE: сверх этого запросы сразу
+    отклоняются с HasherOverloaded, а не копятся бесконечно.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_waiting = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def max_workers(self):
+        if settings.LOGIN_HASH_WORKERS is None:
+            return os.cpu_count() or 1
+        return settings.LOGIN_HASH_WORKERS
+
+    @property
+    def max_queue(self):
+        return settings.LOGIN_HASH_MAX_QUEUE
+
+    def get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if settings.LOGIN_HASH_EXECUTOR == 'process':
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_worker,
+                        initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'root.settings'),),
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix='password-hasher')
+            return self._executor
+
+    async def run(self, func, *args):
+        executor = self.get_executor()
+        with self._lock:
+            if self.in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise HasherOverloaded()
+            self.in_flight += 1
+            self.peak_waiting = max(self.peak_waiting, self.in_flight - self.max_workers)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+
+    async def verify(self, password, encoded):
+        return await self.run(verify_password, password, encoded)
+
+    async def make(self, password):
+        return await self.run(make_password, password)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'executor': settings.LOGIN_HASH_EXECUTOR,
+                'workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'in_flight': self.in_flight,
+                'waiting': max(0, self.in_flight - self.max_workers),
+                'peak_waiting': self.peak_waiting,
+                'completed': self.completed,
+                'rejected': self.rejected,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+password_hasher = PasswordHasherPool()
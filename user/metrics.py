@@ -0,0 +1,35 @@
+from root.metrics import GAUGE, register_metric, registry
+from .authentication import token_cache
+from .hashing import password_hasher
+from .throttling import throttle_store
+
+
+def collect_auth_metrics():
+    cache = token_cache.stats()
+    pool = password_hasher.stats()
+    metrics = [
+        ('auth_token_cache_hits_total', {}, cache['hits']),
+        ('auth_token_cache_misses_total', {}, cache['misses']),
+        ('login_hash_in_flight', {}, pool['in_flight']),
+        ('login_hash_completed_total', {}, pool['completed']),
+        ('login_hash_rejected_total', {}, pool['rejected']),
+    ]
+    throttle = throttle_store.stats()
+    for scope, count in throttle['allowed'].items():
+        metrics.append(('auth_throttle_allowed_total', {'scope': scope}, count))
+    for scope, count in throttle['rejected'].items():
+        metrics.append(('auth_throttle_rejected_total', {'scope': scope}, count))
+    metrics.append(('auth_throttle_errors_total', {}, throttle['errors']))
+    return metrics
+
+
+def register_metrics():
+    register_metric('auth_token_cache_hits_total', 'counter', 'Token lookups served from the cache.')
+    register_metric('auth_token_cache_misses_total', 'counter', 'Token lookups that went to the DB.')
+    register_metric('login_hash_in_flight', GAUGE, 'Password hashing jobs running or queued.')
+    register_metric('login_hash_completed_total', 'counter', 'Password hashing jobs completed.')
+    register_metric('login_hash_rejected_total', 'counter', 'Password hashing jobs rejected as overloaded.')
+    register_metric('auth_throttle_allowed_total', 'counter', 'Login/registration requests within the rate limit.')
+    register_metric('auth_throttle_rejected_total', 'counter', 'Login/registration requests over the rate limit.')
+    register_metric('auth_throttle_errors_total', 'counter', 'Rate limit checks skipped because the store failed.')
+    registry.register_collector(collect_auth_metrics)
@@ -0,0 +1,62 @@
+import datetime
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def backfill_created_at(apps, schema_editor):
+    # Настоящее время добавления неизвестно; сохраняем хотя бы порядок вставки:
+    # более поздние строки (больший id) получают более позднее время
+    Favorite = apps.get_model('user', 'Favorite')
+    now = django.utils.timezone.now()
+    favorites = list(Favorite.objects.order_by('-id').only('id'))
+    for offset, favorite in enumerate(favorites):
+        favorite.created_at = now - datetime.timedelta(microseconds=offset)
+    Favorite.objects.bulk_update(favorites, ['created_at'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0002_user_token_generation'),
+    ]
+
+    operations = [
+        # Неявная through-таблица user_user_favorites становится моделью Favorite
+        # без изменения схемы, затем в нее добавляется время добавления
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='Favorite',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False,
+                                                   verbose_name='ID')),
+                        ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                                      to='product.product')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                                   to='user.user')),
+                    ],
+                    options={
+                        'db_table': 'user_user_favorites',
+                        'unique_together': {('user', 'product')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='user',
+                    name='favorites',
+                    field=models.ManyToManyField(blank=True, through='user.Favorite', to='product.product'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='favorite',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_created_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['user', 'created_at', 'product'], name='user_favorite_created_idx'),
+        ),
+    ]
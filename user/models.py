@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from product.models import Product
 
@@ -25,9 +26,12 @@ class User(AbstractBaseUser, PermissionsMixin):
     username = models.CharField(max_length=100)
     email = models.EmailField(unique=True)
     password = models.CharField(max_length=100)
-    favorites = models.ManyToManyField(Product, blank=True)
+    favorites = models.ManyToManyField(Product, blank=True, through='Favorite')
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Поколение подписанных токенов: увеличивается при выходе, и все
+    # выданные ранее токены (user.authentication.SignedTokenAuthentication) отзываются
+    token_generation = models.PositiveIntegerField(default=0, editable=False)
 
     objects = UserManager()
 
@@ -36,3 +40,24 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     def __str__(self):
         return self.email
+
+
+class Favorite(models.Model):
+    """
+    Связь пользователь-товар в Избранном со временем добавления
+    (та же таблица, что была у неявной ManyToManyField).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'user_user_favorites'
+        unique_together = [('user', 'product')]
+        # Список Избранного пользователя от новых к старым читается по индексу
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'product'], name='user_favorite_created_idx'),
+        ]
+
+    def __str__(self):
+        return '%s: %s' % (self.user_id, self.product_id)
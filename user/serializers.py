@@ -1,3 +1,4 @@
+from django.db.models import BigIntegerField
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from .models import User
@@ -24,9 +25,13 @@ class UserCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("The username should not contain special characters.")
         return username
 
+    def create(self, validated_data):
+        # Через менеджер, чтобы пароль сохранился хэшем, а не открытым текстом
+        return User.objects.create_user(**validated_data)
+
 
 class UserFavoriteCreateSerializers(serializers.Serializer):
-    product_id = serializers.IntegerField()
+    product_id = serializers.IntegerField(max_value=BigIntegerField.MAX_BIGINT)
 
     def validate_product_id(self, value):
         request = self.context.get('request')
@@ -42,3 +47,19 @@ class UserFavoriteCreateSerializers(serializers.Serializer):
             raise serializers.ValidationError("Product already in favorites.")
 
         return value
+
+
+class UserFavoriteBatchSerializer(serializers.Serializer):
+    add = serializers.ListField(child=serializers.IntegerField(min_value=1, max_value=BigIntegerField.MAX_BIGINT),
+                                required=False, max_length=500)
+    remove = serializers.ListField(child=serializers.IntegerField(min_value=1, max_value=BigIntegerField.MAX_BIGINT),
+                                   required=False, max_length=500)
+
+    def validate(self, attrs):
+        add = set(attrs.get('add', []))
+        remove = set(attrs.get('remove', []))
+        if not add and not remove:
+            raise serializers.ValidationError("Nothing to add or remove.")
+        if add & remove:
+            raise serializers.ValidationError("The same product can not be added and removed at once.")
+        return attrs
@@ -0,0 +1,106 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from product.popularity import adjust_favorite_counts
+from product.similar import record_favorite_change
+from root.replicas import pin_to_primary
+
+from .authentication import token_cache
+from .models import User
+
+
+# Поля, от которых зависит аутентификация и данные закэшированного пользователя
+AUTH_FIELDS = ('password', 'is_active', 'is_staff', 'is_superuser', 'email', 'username')
+
+
+@receiver(pre_save, sender=User)
+def remember_auth_fields(sender, instance, update_fields=None, **kwargs):
+    # Сохранения, не меняющие этих полей, кэш токенов не сбрасывают
+    if instance._state.adding or (update_fields is not None and not set(update_fields) & set(AUTH_FIELDS)):
+        return
+    old = User.objects.filter(pk=instance.pk).values(*AUTH_FIELDS).first()
+    instance._auth_changed = old is None or any(old[field] != getattr(instance, field) for field in AUTH_FIELDS)
+
+
+@receiver(post_save, sender=User)
+def invalidate_changed_user_tokens(sender, instance, **kwargs):
+    # Деактивация, смена пароля или прав не должны ждать истечения TTL
+    if instance.__dict__.pop('_auth_changed', False):
+        token_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    token_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+@receiver(m2m_changed, sender=User.favorites.through)
+def update_favorite_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Поддерживает Product.favorite_count. Для remove Django передает
+    запрошенные id, а не реально удаленные, поэтому до удаления
+    выясняем, какие связи действительно существуют.
+    """
+    through = User.favorites.through
+    if reverse:
+        # product.user_set.add(...): instance - товар, pk_set - пользователи
+        links, pk_field = through.objects.filter(product_id=instance.pk), 'user_id'
+    else:
+        links, pk_field = through.objects.filter(user_id=instance.pk), 'product_id'
+
+    if action in ('pre_remove', 'pre_clear'):
+        if action == 'pre_remove':
+            links = links.filter(**{pk_field + '__in': pk_set})
+        instance._removed_favorites = list(links.values_list(pk_field, flat=True))
+        return
+
+    if action == 'post_add':
+        changed, delta = pk_set, 1
+    elif action in ('post_remove', 'post_clear'):
+        changed, delta = instance.__dict__.pop('_removed_favorites', []), -1
+    else:
+        return
+
+    if reverse:
+        adjust_favorite_counts([instance.pk], delta * len(changed))
+    else:
+        adjust_favorite_counts(changed, delta)
+
+
+@receiver(m2m_changed, sender=User.favorites.through)
+def update_similar_products(sender, instance, action, reverse, pk_set, **kwargs):
+    # Счетчики пар считаются по таблице связей: при добавлении - когда новые
+    # связи уже в ней, при удалении - пока удаляемые еще в ней
+    if action not in ('post_add', 'pre_remove', 'pre_clear'):
+        return
+    delta = 1 if action == 'post_add' else -1
+    if not reverse:
+        record_favorite_change([instance.pk], None if action == 'pre_clear' else pk_set, delta)
+        return
+    if action == 'pre_clear':
+        pk_set = list(User.favorites.through.objects.filter(product_id=instance.pk)
+                      .values_list('user_id', flat=True))
+    # Все пользователи товара учитываются одной пачкой
+    record_favorite_change(pk_set, [instance.pk], delta)
+
+
+@receiver(m2m_changed, sender=User.favorites.through)
+def pin_favorites_reader(sender, instance, action, reverse, pk_set, **kwargs):
+    # Read-your-writes: пока реплика догоняет, пользователь читает Избранное с primary
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            pin_to_primary(instance.pk)
+    elif action == 'pre_clear':
+        # product.user_set.clear(): pk_set пуст, пользователей узнаем до удаления связей
+        links = User.favorites.through.objects.filter(product_id=instance.pk)
+        for user_id in links.values_list('user_id', flat=True):
+            pin_to_primary(user_id)
+    elif action in ('post_add', 'post_remove'):
+        for user_id in pk_set:
+            pin_to_primary(user_id)
@@ -0,0 +1,192 @@
+# Ограничение частоты входа и регистрации ведрами токенов в SQLite-файле
+# AUTH_THROTTLE_PATH, общем для всех воркеров хоста. Если хранилище
+# недоступно, запрос пропускается.
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Емкость и скорость подставляются параметрами; все выражения SET видят
+# старые значения строки, поэтому refilled считается одинаково в обоих местах
+REFILLED_SQL = 'MIN(:capacity, tokens + MAX(:now - updated, 0) * :rate)'
+TAKE_SQL = (
+    'INSERT INTO buckets (key, tokens, updated, allowed) VALUES (:key, :capacity - 1, :now, 1) '
+    'ON CONFLICT (key) DO UPDATE SET '
+    'tokens = CASE WHEN {refilled} >= 1 THEN {refilled} - 1 ELSE {refilled} END, '
+    'updated = :now, allowed = {refilled} >= 1 '
+    'RETURNING tokens, allowed'
+).format(refilled=REFILLED_SQL)
+
+
+def parse_rate(rate):
+    """
+    "10/min" -> (10, 10 / 60): емкость ведра и пополнение в секунду.
+    """
+    try:
+        count, period = rate.split('/')
+        count = int(count)
+        seconds = PERIODS[period[0]]
+    except (AttributeError, ValueError, KeyError, IndexError):
+        raise ImproperlyConfigured('Invalid throttle rate %r, expected "<count>/<s|min|hour|day>"' % (rate,))
+    return count, count / seconds
+
+
+class TokenBucketStore:
+    """
+    Ведра в SQLite-файле. Соединение свое у каждого потока, счетчики
+    разрешенных/отклоненных запросов - в памяти процесса (для /metrics/).
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pruned = 0.0
+        self.allowed = defaultdict(int)
+        self.rejected = defaultdict(int)
+        self.errors = 0
+
+    def connect(self):
+        path = settings.AUTH_THROTTLE_PATH
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.path != path:
+            connection = sqlite3.connect(path, timeout=1.0, isolation_level=None)
+            # WAL: читатели не ждут писателя; потеря последних изменений при сбое не страшна
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS buckets ('
+                'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, allowed INTEGER NOT NULL'
+                ') WITHOUT ROWID'
+            )
+            self._local.connection, self._local.path = connection, path
+        return connection
+
+    def take(self, scope, key, rate):
+        """
+        Забирает токен из ведра scope:key. Возвращает None, если токен был,
+        иначе сколько секунд ждать следующего.
+        """
+        capacity, per_second = parse_rate(rate)
+        now = time.time()
+        try:
+            connection = self.connect()
+            # fetchall доводит UPSERT ... RETURNING до конца и освобождает блокировку записи
+            [(tokens, allowed)] = connection.execute(TAKE_SQL, {
+                'key': '%s:%s' % (scope, key), 'capacity': capacity, 'rate': per_second, 'now': now,
+            }).fetchall()
+            self.prune(connection, now)
+        except sqlite3.Error:
+            with self._lock:
+                self.errors += 1
+            return None
+        with self._lock:
+            if allowed:
+                self.allowed[scope] += 1
+            else:
+                self.rejected[scope] += 1
+        return None if allowed else (1 - tokens) / per_second
+
+    def prune(self, connection, now):
+        # Полное ведро ничем не отличается от отсутствующего: раз в минуту удаляем
+        # ведра, которые успели бы наполниться при самой медленной из скоростей
+        if now - self._pruned < 60:
+            return
+        self._pruned = now
+        rates = [parse_rate(rate) for rate in settings.AUTH_THROTTLE_RATES.values() if rate]
+        if rates:
+            horizon = max(capacity / per_second for capacity, per_second in rates)
+            connection.execute('DELETE FROM buckets WHERE updated < ?', [now - horizon])
+
+    def stats(self):
+        with self._lock:
+            return {
+                'allowed': dict(self.allowed),
+                'rejected': dict(self.rejected),
+                'errors': self.errors,
+            }
+
+    def reset(self):
+        with self._lock:
+            self.allowed.clear()
+            self.rejected.clear()
+            self.errors = 0
+            self._pruned = 0.0
+        if os.path.exists(settings.AUTH_THROTTLE_PATH):
+            self.connect().execute('DELETE FROM buckets')
+
+
+throttle_store = TokenBucketStore()
+
+
+def normalize_email(email):
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+def take_token(scope, kind, key):
+    """
+    None - запрос разрешен (или ограничение для '<scope>_<kind>' отключено),
+    иначе секунды до следующей попытки.
+    """
+    rate = settings.AUTH_THROTTLE_RATES.get('%s_%s' % (scope, kind))
+    if rate is None or key is None:
+        return None
+    return throttle_store.take('%s_%s' % (scope, kind), key, rate)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Ограничение по view.throttle_scope ("login", "register"): скорость берется
+    из AUTH_THROTTLE_RATES['<scope>_<kind>'], None отключает ограничение.
+    """
+    kind = None
+
+    def get_key(self, request):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        self.retry_after = take_token(view.throttle_scope, self.kind, self.get_key(request))
+        return self.retry_after is None
+
+    def wait(self):
+        return self.retry_after
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    kind = 'ip'
+
+    def get_key(self, request):
+        # X-Forwarded-For учитывается только за NUM_PROXIES доверенными прокси,
+        # как и во встроенных throttles DRF; по умолчанию (0) - REMOTE_ADDR
+        return self.get_ident(request)
+
+
+class EmailTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Ведро на адрес: перебор паролей к одному аккаунту с многих IP.
+    """
+    kind = 'email'
+
+    def get_key(self, request):
+        data = request.data
+        return normalize_email(data.get('email')) if hasattr(data, 'get') else None
+
+
+AUTH_THROTTLES = (IPTokenBucketThrottle, EmailTokenBucketThrottle)
+
+
+def throttle_wait(request, scope, email):
+    """
+    Те же ограничения для представлений вне DRF (AsyncLoginView):
+    None или наибольшее время ожидания.
+    """
+    waits = [take_token(scope, 'ip', IPTokenBucketThrottle().get_ident(request)),
+             take_token(scope, 'email', normalize_email(email))]
+    waits = [wait for wait in waits if wait is not None]
+    return max(waits) if waits else None
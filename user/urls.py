@@ -1,11 +1,16 @@
 from django.urls import path
-from .views import UserCreateView, UserFavoriteView,LoginView, LogoutView
+from .async_views import AsyncLoginView, AsyncUserFavoriteView
+from .views import UserCreateView, UserFavoriteView,LoginView, LogoutView, AuthStatsView, UserFavoriteBatchView
 
 
 urlpatterns = [
     path('register/', UserCreateView.as_view(), name='user-create'),
     path('login/', LoginView.as_view(), name='login'),
+    path('login/async/', AsyncLoginView.as_view(), name='login-async'),
     path('logout/', LogoutView.as_view(), name='logout'),
+    path('auth/stats/', AuthStatsView.as_view(), name='auth-stats'),
     path('favorite/', UserFavoriteView.as_view(), name='user-favorite'),
+    path('favorite/async/', AsyncUserFavoriteView.as_view(), name='user-favorite-async'),
+    path('favorite/batch/', UserFavoriteBatchView.as_view(), name='user-favorite-batch'),
     path('favorite/<int:pk>/', UserFavoriteView.as_view(), name='user-favorite-delete'),
 ]
\ No newline at end of file
@@ -1,27 +1,42 @@
 from rest_framework import generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.exceptions import NotFound, ValidationError
+from django.db.models import F
+from .authentication import LOGIN_MODES, SignedTokenAuthentication, signed_token_payload, token_cache
+from .hashing import password_hasher
 from .models import User
 from product.models import Product
-from product.serializers import ProductSerializer
+from product.serializers import ProductReadSerializer
 from rest_framework.authtoken.models import Token
-from .serializers import UserCreateSerializer, UserFavoriteCreateSerializers
+from .favorites import favorites_queryset, update_favorites
+from .serializers import UserCreateSerializer, UserFavoriteCreateSerializers, UserFavoriteBatchSerializer
+from .throttling import AUTH_THROTTLES, throttle_store
 from rest_framework import mixins
 from rest_framework import status
+from root.replicas import ReplicaReadMixin
 
 
 class LoginView(APIView):
+    # Ограничения проверяются до check_password (user.throttling)
+    throttle_classes = AUTH_THROTTLES
+    throttle_scope = 'login'
+
     def post(self, request, *args, **kwargs):
         email = request.data.get('email')
         password = request.data.get('password')
+        mode = request.data.get('mode', 'token')
+        if mode not in LOGIN_MODES:
+            return Response({"error": "Unknown token mode."}, status=status.HTTP_400_BAD_REQUEST)
         try:
             user = User.objects.get(email=email)
         except User.DoesNotExist:
             return Response({"error": "User with this email does not exist."}, status=status.HTTP_400_BAD_REQUEST)
 
         if user.check_password(password):
+            if mode == 'signed':
+                return Response(signed_token_payload(user))
             token, created = Token.objects.get_or_create(user=user)
             return Response({'token': token.key})
         else:
@@ -32,16 +47,36 @@ class LogoutView(APIView):
     permission_classes = (IsAuthenticated,)
 
     def post(self, request, *args, **kwargs):
-        request.user.auth_token.delete()
+        if isinstance(request.successful_authenticator, SignedTokenAuthentication):
+            # Подписанные токены не хранятся: отзываем все сразу новым поколением
+            User.objects.filter(pk=request.user.pk).update(token_generation=F('token_generation') + 1)
+        else:
+            request.user.auth_token.delete()
+        token_cache.invalidate_user(request.user.pk)
         return Response(status=status.HTTP_200_OK)
 
 
+class AuthStatsView(APIView):
+    # Счетчики кэша аутентификации, пула хэширования паролей и ограничения частоты
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        return Response({
+            'token_cache': token_cache.stats(),
+            'login_hash_pool': password_hasher.stats(),
+            'throttle': throttle_store.stats(),
+        })
+
+
 class UserCreateView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserCreateSerializer
+    throttle_classes = AUTH_THROTTLES
+    throttle_scope = 'register'
 
 
-class UserFavoriteView(generics.GenericAPIView,
+class UserFavoriteView(ReplicaReadMixin,
+                       generics.GenericAPIView,
                        mixins.CreateModelMixin):
     permission_classes = (IsAuthenticated,)
 
@@ -62,10 +97,9 @@ class UserFavoriteView(generics.GenericAPIView,
             raise NotFound("product not found")
 
     def get(self, request, *args, **kwargs):
-        user = request.user
-        queryset = user.favorites.all()
-        serializer = ProductSerializer(queryset, many=True)
-        return Response(serializer.data)
+        # Keyset-страницы от недавно добавленных, каждая - один запрос с JOIN
+        page = self.paginate_queryset(favorites_queryset(request.user))
+        return self.get_paginated_response(ProductReadSerializer(page, many=True).data)
 
     def post(self, request, *args, **kwargs):
         email = request.user.email
@@ -75,7 +109,6 @@ class UserFavoriteView(generics.GenericAPIView,
         product_id = serializer.validated_data.get("product_id")
         product = self.get_product(product_id)
         user.favorites.add(product)
-        user.save()
         return Response(status=201)
 
     def delete(self, request, pk, *args, **kwargs):
@@ -85,8 +118,22 @@ class UserFavoriteView(generics.GenericAPIView,
         if user.favorites.filter(id=pk).exists():
             product = self.get_product(pk)
             user.favorites.remove(product)
-            user.save()
             return Response(status=204)
         else:
             raise NotFound("product not found from favorites")
 
+
+class UserFavoriteBatchView(generics.GenericAPIView):
+    """
+    Пакетная синхронизация Избранного: {"add": [id, ...], "remove": [id, ...]}.
+    """
+    permission_classes = (IsAuthenticated,)
+    serializer_class = UserFavoriteBatchSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = update_favorites(request.user,
+                                  add=serializer.validated_data.get('add', []),
+                                  remove=serializer.validated_data.get('remove', []))
+        return Response(result, status=status.HTTP_200_OK)